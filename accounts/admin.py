@@ -1,39 +1,162 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .approval import set_active
 from .models import *
+from .profiles import materialize_profiles
+from .search import MAX_LIMIT, search_patient_ids
 
 # Register your models here.
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    this class will estimate the count of the unfiltered changelists from the
+    database statistics instead of running COUNT(*) over the whole table
+
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimated_count(
+                connections[queryset.db], queryset.model._meta.db_table
+            )
+            if estimate is not None:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimated_count(connection, table):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table]
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute(f'SELECT max(id) - min(id) + 1 FROM "{table}"')
+            else:
+                return None
+            row = cursor.fetchone()
+
+        # small tables and tables without statistics yet are counted exactly
+        if row is None or row[0] is None or row[0] < 1000:
+            return None
+        return row[0]
+
+
+@admin.action(description="Approve the selected accounts")
+def approve(modeladmin, request, queryset):
+    """this function will approve the selected accounts with one UPDATE"""
+
+    updated, profiles = set_active(queryset, True)
+    modeladmin.message_user(
+        request, f"{updated} accounts approved, {profiles} profiles created"
+    )
+
+
+@admin.action(description="Deactivate the selected accounts")
+def deactivate(modeladmin, request, queryset):
+    """this function will deactivate the selected accounts with one UPDATE"""
+
+    updated, _ = set_active(queryset, False)
+    modeladmin.message_user(request, f"{updated} accounts deactivated")
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """this class will be the base of the admin panels of the tables that grow large"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        this function will also look the email search fields up with the term in lower
+        case, the emails are saved in lower case so a mixed case term finds them
+
+        """
+
+        results, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        email = normalize_email(search_term)
+        if email and email != search_term:
+            for field in self.get_search_fields(request):
+                if field.endswith("email__exact"):
+                    results |= queryset.filter(**{field: email})
+        return results, may_have_duplicates
+
+
 @admin.register(Patient)
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(LargeTableAdmin):
     """this class will create the admin panel of the patient model"""
 
     list_display = ["id", "first_name", "phone_number", "email", "created_at"]
-    list_filter = ["national_id_number", "phone_number", "gender"]
-    search_fields = ["national_id_number", "phone_number", "gender"]
+    list_filter = ["gender"]
+    search_fields = ["email__exact"]
+
+    def get_search_results(self, request, queryset, search_term):
+        """this function will search the patients in the search index of the patients"""
+
+        if not search_term:
+            return queryset, False
+        ids = search_patient_ids(search_term, limit=MAX_LIMIT)
+        email = normalize_email(search_term)
+        return queryset.filter(pk__in=ids) | queryset.filter(email=email), False
+
+
+class StaffAdmin(LargeTableAdmin):
+    """this class will be the base of the admin panels of the doctors and pharmacists"""
+
+    actions = [approve, deactivate]
+
+    def save_model(self, request, obj, form, change):
+        """
+        this function will save the account and create the profile of an account
+        approved in the change form, the post_save signal covers the accounts
+        created active only
+
+        """
+
+        super().save_model(request, obj, form, change)
+        if change and obj.active and "active" in form.changed_data:
+            materialize_profiles(type(obj).objects.filter(pk=obj.pk))
 
 
 @admin.register(Doctor)
-class DoctorAdmin(admin.ModelAdmin):
+class DoctorAdmin(StaffAdmin):
     """this class will create the admin panel of the doctor model"""
 
-    list_display = ["id", "first_name", "phone_number", "email", "created_at"]
-    list_filter = ["national_id_number", "phone_number", "gender"]
-    search_fields = [
-        "national_id_number",
+    list_display = [
+        "id",
+        "first_name",
         "phone_number",
-        "graduation_year",
-        "membership_no",
+        "email",
+        "specialization",
+        "active",
+        "created_at",
+    ]
+    list_filter = ["gender", "active"]
+    list_select_related = ["specialization"]
+    autocomplete_fields = ["specialization"]
+    search_fields = [
+        "national_id_number__exact",
+        "phone_number__exact",
+        "membership_no__exact",
+        "email__exact",
     ]
 
 
 @admin.register(Pharmacist)
-class PharmacistAdmin(admin.ModelAdmin):
+class PharmacistAdmin(StaffAdmin):
     """this class will create the admin panel of the pharmacist model"""
 
-    list_display = ["id", "first_name", "phone_number", "email", "created_at"]
-    list_filter = ["national_id_number", "phone_number", "gender"]
-    search_fields = ["national_id_number", "phone_number", "shift"]
+    list_display = ["id", "first_name", "phone_number", "email", "active", "created_at"]
+    list_filter = ["gender", "shift", "active"]
+    search_fields = ["national_id_number__exact", "phone_number__exact", "email__exact"]
 
 
 @admin.register(Specialization)
@@ -41,32 +164,44 @@ class SpecializationAdmin(admin.ModelAdmin):
     """this class will create the admin panel of the specialization model"""
 
     list_display = ["id", "name"]
-    list_filter = ["name"]
     search_fields = ["name"]
 
 
 @admin.register(PatientProfile)
-class PatientProfileAdmin(admin.ModelAdmin):
+class PatientProfileAdmin(LargeTableAdmin):
     """this class will create the admin panel of the patient profile model"""
 
     list_display = ["id", "Patient_name"]
-    list_filter = ["Patient_name"]
-    search_fields = ["Patient_name"]
+    list_select_related = ["Patient_name"]
+    raw_id_fields = ["Patient_name"]
+    search_fields = ["Patient_name__email__exact"]
 
 
 @admin.register(DoctorProfile)
-class DoctorProfileAdmin(admin.ModelAdmin):
+class DoctorProfileAdmin(LargeTableAdmin):
     """this class will create the admin panel of the doctor profile model"""
 
     list_display = ["id", "doctor_name"]
-    list_filter = ["doctor_name"]
-    search_fields = ["doctor_name"]
+    list_select_related = ["doctor_name"]
+    raw_id_fields = ["doctor_name"]
+    search_fields = ["doctor_name__email__exact"]
 
 
 @admin.register(PharmacistProfile)
-class PharmacistProfileAdmin(admin.ModelAdmin):
+class PharmacistProfileAdmin(LargeTableAdmin):
     """this class will create the admin panel of the pharmacist profile model"""
 
     list_display = ["id", "pharmacist_name"]
-    list_filter = ["pharmacist_name"]
-    search_fields = ["pharmacist_name"]
+    list_select_related = ["pharmacist_name"]
+    raw_id_fields = ["pharmacist_name"]
+    search_fields = ["pharmacist_name__email__exact"]
+
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    """this class will create the admin panel of the background tasks"""
+
+    list_display = ["id", "name", "status", "attempts", "run_after", "created_at"]
+    list_filter = ["status"]
+    search_fields = ["name__exact"]
+    readonly_fields = ["last_error"]
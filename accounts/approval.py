@@ -0,0 +1,36 @@
+"""
+in this module we will approve and deactivate doctors and pharmacists in bulk,
+the accounts are changed with one UPDATE and the profiles missing for the
+approved accounts are materialized with one bulk_create, the post_save signals
+do not run for them
+
+"""
+
+from django.db import transaction
+
+from .models import Doctor, Pharmacist
+from .profiles import materialize_profiles
+
+
+MAX_IDS = 1000
+
+STAFF = {
+    "doctors": Doctor,
+    "pharmacists": Pharmacist,
+}
+
+
+def set_active(queryset, active):
+    """
+    this function will set active on the doctors or pharmacists of the queryset
+    and create the profiles of the approved ones that have none,
+    it returns the number of changed accounts and of inserted profiles
+
+    """
+
+    queryset = queryset.order_by()
+
+    with transaction.atomic():
+        updated = queryset.exclude(active=active).update(active=active)
+        created = materialize_profiles(queryset) if active else 0
+    return updated, created
@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    """
+    this function will restore the sqlite search triggers after every migrate,
+    a migration that rebuilds the patient table drops them
+
+    """
+
+    from .search import ensure_search_triggers
+
+    ensure_search_triggers(using)
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
+
+    def ready(self):
+        from .throttling import check_login_rates
+
+        post_migrate.connect(restore_search_triggers, sender=self)
+        checks.register(check_login_rates)
@@ -0,0 +1,57 @@
+from django.core import signing
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .tokens import load_access_token
+
+
+class TokenUser:
+    """
+    this class will represent the account of a verified access token,
+    it is built from the token payload without loading the account
+
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, role, pk):
+        self.role = role
+        self.pk = self.id = pk
+
+    def __str__(self):
+        return f"{self.role} {self.pk}"
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    this class will authenticate the requests with an
+    `Authorization: Bearer <access token>` header
+
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise AuthenticationFailed("Invalid token header")
+
+        try:
+            payload = load_access_token(auth[1].decode())
+        except signing.SignatureExpired:
+            raise AuthenticationFailed("Token expired")
+        except (signing.BadSignature, UnicodeDecodeError):
+            raise AuthenticationFailed("Invalid token")
+
+        return TokenUser(payload["role"], payload["id"]), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,292 @@
+"""
+in this module we will import patients in bulk from csv or jsonl files,
+the rows are validated and inserted in chunks instead of going through
+the signup view one row at a time
+
+"""
+
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+from .models import Patient
+from .serializers import PatientSerializer
+from .tasks import enqueue
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+UNIQUE_FIELDS = ["user_name", "email", "national_id_number", "phone_number", "slug"]
+
+FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+
+class ImportReport:
+    """
+    this class will collect the number of created patients
+    and the rejected rows with the reason of the rejection
+
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.rejected = []
+
+    def reject(self, line, errors):
+        self.rejected.append({"line": line, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "rejected_count": len(self.rejected),
+            "rejected": self.rejected,
+        }
+
+
+def guess_format(file_name):
+    """this function will return the import format from the extension of the file name"""
+
+    for extension, file_format in FORMATS.items():
+        if file_name.lower().endswith(extension):
+            return file_format
+    return None
+
+
+def read_rows(stream, file_format):
+    """
+    this function will read a binary stream lazily and yield (line, row) pairs,
+    a row is None when the line could not be decoded
+
+    """
+
+    lines = (
+        raw.decode("utf-8-sig") if isinstance(raw, bytes) else raw for raw in stream
+    )
+
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _encode(hasher, password):
+    """this function will hash one password, in a process of the pool"""
+
+    return hasher.encode(password, hasher.salt())
+
+
+def _is_hashed(password):
+    """this function will tell if the password is already a django password hash"""
+
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return False
+    return True
+
+
+def _hash_passwords(passwords, pool):
+    """
+    this function will hash the passwords of a chunk in the process pool, or in
+    this process without a pool, rows exported from another system may already
+    carry a django password hash which is kept as it is
+
+    """
+
+    passwords = list(passwords)
+    pending = [
+        index for index, password in enumerate(passwords) if not _is_hashed(password)
+    ]
+    encode = partial(_encode, get_hasher())
+    raw = [passwords[index] for index in pending]
+
+    if pool is None:
+        hashed = map(encode, raw)
+    else:
+        hashed = pool.map(encode, raw, chunksize=max(1, len(raw) // 64))
+    for index, password in zip(pending, hashed):
+        passwords[index] = password
+    return passwords
+
+
+def hash_pool(workers=None):
+    """
+    this function will return the process pool of ACCOUNTS_IMPORT_HASH_WORKERS
+    processes to hash the passwords in, or a context of None for a single process
+
+    """
+
+    if workers is None:
+        workers = getattr(settings, "ACCOUNTS_IMPORT_HASH_WORKERS", 1)
+    if workers <= 1:
+        return nullcontext()
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _validate_chunk(chunk, report):
+    """
+    this function will validate the rows of the chunk without touching the database
+    and will return the (line, data) pairs of the valid rows
+
+    """
+
+    valid = []
+    for line, row in chunk:
+        if row is None:
+            report.reject(line, {"non_field_errors": ["invalid row"]})
+            continue
+
+        serializer = PatientSerializer(data=row)
+        if not serializer.is_valid():
+            report.reject(line, serializer.errors)
+            continue
+
+        data = serializer.validated_data
+        if data["password"] != data["password_confirmation"]:
+            report.reject(line, {"password_confirmation": ["passwords do not match"]})
+            continue
+
+        data["slug"] = slugify(data["user_name"])
+        if not data["slug"]:
+            report.reject(
+                line, {"user_name": ["user_name can not be converted to a slug"]}
+            )
+            continue
+
+        valid.append((line, data))
+    return valid
+
+
+def _drop_duplicates(valid, seen, report):
+    """
+    this function will reject the rows that clash with an existing patient or with
+    an earlier row of the import, the database is queried once per unique field
+
+    """
+
+    taken = {}
+    for field in UNIQUE_FIELDS:
+        values = {data[field] for _, data in valid}
+        taken[field] = set(
+            Patient.objects.filter(**{f"{field}__in": values})
+            .order_by()
+            .values_list(field, flat=True)
+        )
+
+    accepted = []
+    for line, data in valid:
+        errors = {
+            field: [
+                f"patient with this {Patient._meta.get_field(field).verbose_name} already exists."
+            ]
+            for field in UNIQUE_FIELDS
+            if data[field] in taken[field] or data[field] in seen[field]
+        }
+        if errors:
+            report.reject(line, errors)
+            continue
+
+        for field in UNIQUE_FIELDS:
+            seen[field].add(data[field])
+        accepted.append((line, data))
+    return accepted
+
+
+def _insert_chunk(accepted, report, pool=None):
+    """
+    this function will insert the patients of the chunk with one bulk_create,
+    when a row conflicts with a patient saved meanwhile the rows are inserted
+    one at a time so only the conflicting rows are rejected, their profiles
+    are created by the materialize_missing_profiles task of the import
+
+    """
+
+    passwords = _hash_passwords((data["password"] for _, data in accepted), pool)
+    rows = [
+        (line, Patient(**dict(data, password=password, password_confirmation=password)))
+        for (line, data), password in zip(accepted, passwords)
+    ]
+
+    try:
+        with transaction.atomic():
+            Patient.objects.bulk_create([patient for _, patient in rows])
+    except IntegrityError:
+        _insert_rows(rows, report)
+        return
+
+    report.created += len(rows)
+
+
+def _insert_rows(rows, report):
+    """
+    this function will insert the (line, patient) rows one at a time and reject
+    the rows that violate a unique constraint with the errors of their fields
+
+    """
+
+    serializer = PatientSerializer()
+    for line, patient in rows:
+        try:
+            with transaction.atomic():
+                Patient.objects.bulk_create([patient])
+        except IntegrityError as error:
+            report.reject(
+                line,
+                serializer.unique_violation_errors(error)
+                or {
+                    "non_field_errors": ["row conflicts with a patient saved meanwhile"]
+                },
+            )
+            continue
+        report.created += 1
+
+
+def import_patients(stream, file_format, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    this function will import the patients of a csv or jsonl stream chunk by chunk
+    and will return an ImportReport, the passwords are hashed in a pool of
+    `workers` processes, ACCOUNTS_IMPORT_HASH_WORKERS by default, and the
+    profiles of the created patients are left to a materialize_missing_profiles task
+
+    """
+
+    report = ImportReport()
+    seen = {field: set() for field in UNIQUE_FIELDS}
+    rows = read_rows(stream, file_format)
+
+    with hash_pool(workers) as pool:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            valid = _validate_chunk(chunk, report)
+            accepted = _drop_duplicates(valid, seen, report) if valid else []
+            if accepted:
+                _insert_chunk(accepted, report, pool)
+
+    if report.created:
+        enqueue("materialize_missing_profiles", Patient._meta.label_lower, once=True)
+    return report
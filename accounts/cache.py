@@ -0,0 +1,70 @@
+"""
+in this module we will keep the version counter of the specializations,
+the cached specialization responses are keyed by the version so bumping it
+on every save or delete invalidates all of them at once, the same version
+decides when the map of the specializations kept in the process is reloaded
+
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+
+
+SPECIALIZATION_VERSION_KEY = "accounts:specialization:version"
+
+
+def _new_version():
+    # a lost counter restarts from the clock so it never reuses an older version
+    return int(time.time() * 1000)
+
+
+def specialization_version():
+    """this function will return the current version of the specializations"""
+
+    version = cache.get(SPECIALIZATION_VERSION_KEY)
+    if version is None:
+        cache.add(SPECIALIZATION_VERSION_KEY, _new_version(), timeout=None)
+        version = cache.get(SPECIALIZATION_VERSION_KEY)
+    return version
+
+
+_specializations = {"version": None, "by_id": {}}
+_specializations_lock = threading.Lock()
+
+
+def bump_specialization_version():
+    """this function will invalidate everything cached for the specializations"""
+
+    _specializations["version"] = None
+
+    try:
+        cache.incr(SPECIALIZATION_VERSION_KEY)
+    except ValueError:
+        cache.set(SPECIALIZATION_VERSION_KEY, _new_version(), timeout=None)
+
+
+def specialization_cache_key(version, name):
+    return f"accounts:specialization:{version}:{name}"
+
+
+def specializations_by_id():
+    """
+    this function will return the specializations by id from a map kept in the process,
+    it is loaded with one query and reloaded only when the version changes
+
+    """
+
+    from .models import Specialization
+
+    version = specialization_version()
+    if _specializations["version"] != version:
+        with _specializations_lock:
+            if _specializations["version"] != version:
+                _specializations["by_id"] = {
+                    specialization.pk: specialization
+                    for specialization in Specialization.objects.order_by("name")
+                }
+                _specializations["version"] = version
+    return _specializations["by_id"]
@@ -0,0 +1,111 @@
+"""
+in this module we will export the patients, doctors and pharmacists as NDJSON or CSV,
+the rows are read in chunks with QuerySet.iterator() and written one by one
+so the memory stays the same whatever the size of the table
+
+"""
+
+import csv
+import json
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Doctor, Patient, Pharmacist
+from .readers import ValuesReader
+from .serializers import (
+    DoctorProfileSerializer,
+    PharmacistProfileSerializer,
+    ProfilePatientSerializer,
+)
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+EXPORTS = {
+    "patients": (Patient, ProfilePatientSerializer),
+    "doctors": (Doctor, DoctorProfileSerializer),
+    "pharmacists": (Pharmacist, PharmacistProfileSerializer),
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def parse_created(value):
+    """
+    this function will parse a created_at bound given as a date or a datetime,
+    it raises ValueError when the value is not valid
+
+    """
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"invalid date: {value}")
+        parsed = datetime.combine(day, time.min)
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def export_rows(kind, created_after=None, created_before=None, chunk_size=None):
+    """
+    this function will yield the rows of the export as dicts, oldest first,
+    created_after is inclusive and created_before is exclusive
+
+    """
+
+    model, serializer_class = EXPORTS[kind]
+    reader = ValuesReader.for_serializer(serializer_class())
+
+    queryset = model.objects.order_by("created_at", "id")
+    if created_after is not None:
+        queryset = queryset.filter(created_at__gte=created_after)
+    if created_before is not None:
+        queryset = queryset.filter(created_at__lt=created_before)
+
+    for row in reader.rows(queryset).iterator(
+        chunk_size=chunk_size or DEFAULT_CHUNK_SIZE
+    ):
+        yield {
+            "id": row.id,
+            **reader.render_row(row),
+            "created_at": row.created_at.isoformat(),
+        }
+
+
+def export_header(kind):
+    """this function will return the columns of the export"""
+
+    reader = ValuesReader.for_serializer(EXPORTS[kind][1]())
+    return ["id", *reader.names, "created_at"]
+
+
+class _Echo:
+    """this class will return what the csv writer writes instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_export(kind, file_format, **options):
+    """this function will yield the export encoded as NDJSON lines or CSV lines"""
+
+    rows = export_rows(kind, **options)
+
+    if file_format == "ndjson":
+        for row in rows:
+            yield json.dumps(row) + "\n"
+        return
+
+    header = export_header(kind)
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([row[column] for column in header])
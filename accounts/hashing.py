@@ -0,0 +1,100 @@
+"""
+in this module we will verify the login passwords,
+when ACCOUNTS_LOGIN_HASH_WORKERS is set the verification runs in a bounded
+pool of threads so a burst of logins can not hold every worker of the server
+on the password hashing, the requests beyond the pool and its queue get a 503
+
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordVerifierBusy(APIException):
+    """this exception will return 503 with a Retry-After header when the pool is full"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "message: Too many login attempts, try again later"
+    default_code = "password_verifier_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+class BoundedPasswordVerifier:
+    """
+    this class will run check_password in a thread pool of `workers` threads,
+    at most `queue_size` more verifications can wait for a free thread
+
+    """
+
+    def __init__(self, workers, queue_size, retry_after):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-verifier"
+        )
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.retry_after = retry_after
+
+    def check(self, password, encoded):
+        if not self.slots.acquire(blocking=False):
+            raise PasswordVerifierBusy(self.retry_after)
+
+        try:
+            return self.executor.submit(check_password, password, encoded).result()
+        finally:
+            self.slots.release()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    """this function will return the shared verifier or None when the pool is disabled"""
+
+    global _verifier
+
+    workers = getattr(settings, "ACCOUNTS_LOGIN_HASH_WORKERS", 0)
+    if not workers:
+        return None
+
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = BoundedPasswordVerifier(
+                    workers,
+                    getattr(settings, "ACCOUNTS_LOGIN_HASH_QUEUE_SIZE", 0),
+                    getattr(settings, "ACCOUNTS_LOGIN_RETRY_AFTER", 1),
+                )
+    return _verifier
+
+
+def verify_password(password, encoded):
+    """this function will check the password in the pool, or inline when it is disabled"""
+
+    verifier = get_verifier()
+    if verifier is None:
+        return check_password(password, encoded)
+    return verifier.check(password, encoded)
+
+
+@receiver(setting_changed)
+def reset_verifier(setting, **kwargs):
+    """this function will rebuild the pool when its settings change in the tests"""
+
+    global _verifier
+
+    if setting.startswith("ACCOUNTS_LOGIN_") and _verifier is not None:
+        _verifier.shutdown()
+        _verifier = None
@@ -0,0 +1,317 @@
+"""
+in this module we will load test the accounts API of a running server,
+the accounts are seeded in bulk with one known password, then every scenario
+is sent by a pool of threads and its latency percentiles and throughput are
+compared with a saved baseline
+
+"""
+
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Doctor, Patient, Pharmacist, Specialization
+
+
+SEED_PREFIX = "load"
+# the seeded accounts are told apart from the real ones by this reserved domain,
+# no real account can have an email on it
+SEED_DOMAIN = "loadtest.invalid"
+SEED_PASSWORD = "loadtest-password"
+SEED_SPECIALIZATIONS = 10
+
+# role: (model, url of the profiles, url of the login)
+ROLES = {
+    "patient": (Patient, "update/profile/", "patient/login/"),
+    "doctor": (Doctor, "update/doctor/profile/", "doctor/login/"),
+    "pharmacist": (Pharmacist, "update/pharmacist/profile/", "pharmacist/login/"),
+}
+
+
+def _account(role, number, password, specializations):
+    name = f"{SEED_PREFIX}-{role}-{number}"
+    fields = {
+        "user_name": name,
+        "first_name": "load",
+        "last_name": f"{role}{number}",
+        "email": f"{name}@{SEED_DOMAIN}",
+        "password": password,
+        "password_confirmation": password,
+        "national_id_number": f"{role[0].upper()}{number:013d}",
+        "address": "address",
+        "phone_number": f"{role[0].upper()}{number:010d}",
+        "gender": "Male" if number % 2 else "Female",
+        "age": 20 + number % 50,
+        "slug": slugify(name),
+    }
+    if role == "patient":
+        fields["blood_type"] = "A+"
+    else:
+        fields["active"] = True
+    if role == "doctor":
+        fields["specialization"] = specializations[number % len(specializations)]
+        fields["membership_no"] = f"L{number}"
+        fields["graduation_year"] = 2010
+    if role == "pharmacist":
+        fields["shift"] = "Morning"
+    return ROLES[role][0](**fields)
+
+
+def seeded(model, role=None):
+    """
+    this function will return the queryset of the accounts seeded by seed_accounts,
+    the accounts that only share the prefix of their user_name are left out
+
+    """
+
+    prefix = f"{SEED_PREFIX}-{role}-" if role else f"{SEED_PREFIX}-"
+    return model.objects.filter(
+        user_name__startswith=prefix, email__endswith=f"@{SEED_DOMAIN}"
+    )
+
+
+def seed_accounts(patients, doctors, pharmacists, batch_size=1000, replace=False):
+    """
+    this function will seed the accounts of the load test, the accounts seeded
+    before are deleted when replace is set and a ValueError is raised otherwise,
+    every seeded account logs in with SEED_PASSWORD, the profiles are left
+    to materialize_profiles
+
+    """
+
+    password = make_password(SEED_PASSWORD)
+    counts = {"patient": patients, "doctor": doctors, "pharmacist": pharmacists}
+
+    with transaction.atomic():
+        for model, *_ in ROLES.values():
+            if not replace and seeded(model).exists():
+                raise ValueError("the accounts are seeded already, pass replace")
+            seeded(model).delete()
+
+        specializations = [
+            Specialization.objects.get_or_create(
+                name=f"{SEED_PREFIX} specialization {number}",
+                defaults={"slug": f"{SEED_PREFIX}-specialization-{number}"},
+            )[0]
+            for number in range(SEED_SPECIALIZATIONS)
+        ]
+
+        for role, count in counts.items():
+            model = ROLES[role][0]
+            for start in range(0, count, batch_size):
+                model.objects.bulk_create(
+                    _account(role, number, password, specializations)
+                    for number in range(start, min(start + batch_size, count))
+                )
+    return counts
+
+
+def percentile(values, percent):
+    """this function will return the nearest rank percentile of the sorted values"""
+
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class Client:
+    """this class will send the JSON requests of the load test to the server"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.timeout = timeout
+
+    def send(self, method, path, body=None, token=None):
+        """this function will send one request and return (status, body)"""
+
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        request.add_header("Content-Type", "application/json")
+        if token:
+            request.add_header("Authorization", f"Bearer {token}")
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+
+class Scenario:
+    """this class will hold the requests of one endpoint of the load test"""
+
+    def __init__(self, name, build, expected=(200,)):
+        self.name = name
+        self.build = build
+        self.expected = expected
+
+
+def build_scenarios(client, accounts, specialization_ids):
+    """
+    this function will return the scenarios of the endpoints,
+    accounts maps every role to the (id, email) pairs of its seeded accounts
+
+    """
+
+    run = uuid.uuid4().hex[:8]
+    counter = iter(range(10**9))
+    counter_lock = threading.Lock()
+
+    def signup(number):
+        with counter_lock:
+            unique = next(counter)
+        name = f"{SEED_PREFIX}-signup-{run}-{unique}"
+        return (
+            "POST",
+            "signup/",
+            {
+                "user_name": name,
+                "first_name": "load",
+                "last_name": "signup",
+                "email": f"{name}@{SEED_DOMAIN}",
+                "password": SEED_PASSWORD,
+                "password_confirmation": SEED_PASSWORD,
+                "national_id_number": f"S{run[:5]}{unique:08d}",
+                "address": "address",
+                "phone_number": f"S{run[:5]}{unique:08d}",
+                "blood_type": "A+",
+                "gender": "Male",
+                "age": 30,
+            },
+            None,
+        )
+
+    scenarios = [Scenario("signup", signup, expected=(201,))]
+
+    for role, (_, profiles_url, login_url) in ROLES.items():
+        pairs = accounts[role]
+        if not pairs:
+            continue
+
+        status, body = client.send(
+            "POST", login_url, {"email": pairs[0][1], "password": SEED_PASSWORD}
+        )
+        if status != 200:
+            raise RuntimeError(f"{role} login failed with {status}: {body[:200]!r}")
+        token = json.loads(body)["access"]
+        own_id = pairs[0][0]
+
+        def login(number, pairs=pairs, login_url=login_url):
+            email = pairs[number % len(pairs)][1]
+            return "POST", login_url, {"email": email, "password": SEED_PASSWORD}, None
+
+        def profile_list(number, token=token, profiles_url=profiles_url):
+            return "GET", profiles_url, None, token
+
+        def profile_retrieve(
+            number, pairs=pairs, token=token, profiles_url=profiles_url
+        ):
+            return "GET", f"{profiles_url}{pairs[number % len(pairs)][0]}/", None, token
+
+        def profile_update(
+            number, token=token, own_id=own_id, profiles_url=profiles_url
+        ):
+            return (
+                "PATCH",
+                f"{profiles_url}{own_id}/",
+                {"address": f"address {number}"},
+                token,
+            )
+
+        scenarios += [
+            Scenario(f"{role}_login", login),
+            Scenario(f"{role}_profile_list", profile_list),
+            Scenario(f"{role}_profile_retrieve", profile_retrieve),
+            Scenario(f"{role}_profile_update", profile_update),
+        ]
+
+    if specialization_ids:
+
+        def specialization_list(number):
+            return "GET", "specialization/", None, None
+
+        def specialization_retrieve(number):
+            pk = specialization_ids[number % len(specialization_ids)]
+            return "GET", f"specialization/{pk}/", None, None
+
+        scenarios += [
+            Scenario("specialization_list", specialization_list),
+            Scenario("specialization_retrieve", specialization_retrieve),
+        ]
+    return scenarios
+
+
+def run_scenario(client, scenario, requests, concurrency):
+    """this function will send the requests of the scenario and return its statistics"""
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def send(number):
+        nonlocal errors
+        method, path, body, token = scenario.build(number)
+        started = time.perf_counter()
+        try:
+            status, _ = client.send(method, path, body, token)
+        except OSError:
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status not in scenario.expected:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(requests)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(requests / duration, 2) if duration else 0.0,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    this function will return the regressions of the results against the baseline,
+    a scenario regresses when its p95 grows or its throughput drops by more than
+    threshold percent, or when it has errors
+
+    """
+
+    regressions = []
+    limit = threshold / 100
+    for name, result in results.items():
+        if result["errors"]:
+            regressions.append(f"{name}: {result['errors']} failed requests")
+
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + limit):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']}ms, baseline {previous['p95_ms']}ms"
+            )
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - limit):
+            regressions.append(
+                f"{name}: {result['throughput_rps']} req/s, "
+                f"baseline {previous['throughput_rps']} req/s"
+            )
+    return regressions
@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+from accounts.loadtest import percentile
+
+
+class Command(BaseCommand):
+    """
+    this command will compare the latency of the requests that connect to the
+    database every time, that keep a persistent connection and that borrow a
+    connection from the pool of postgresql, on the database of --database
+
+    """
+
+    help = "Benchmark per request connections against persistent and pooled connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--requests", type=int, default=500, help="per thread")
+        parser.add_argument("--threads", type=int, default=4)
+
+    def handle(self, *args, **options):
+        base = connections.settings[options["database"]]
+        # the pool of DB_POOL can not be combined with the persistent connections
+        unpooled = {
+            key: value for key, value in base["OPTIONS"].items() if key != "pool"
+        }
+        modes = {
+            "connect": {"CONN_MAX_AGE": 0, "OPTIONS": unpooled},
+            "persistent": {"CONN_MAX_AGE": None, "OPTIONS": unpooled},
+        }
+        if base["ENGINE"] == "django.db.backends.postgresql":
+            modes["pool"] = {
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {**unpooled, "pool": base["OPTIONS"].get("pool", True)},
+            }
+
+        self.stdout.write(
+            f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        for mode, overrides in modes.items():
+            result = self.run(mode, {**base, **overrides}, options)
+            self.stdout.write(
+                f"{mode:<12}{result['rate']:>10,.0f}{result['p50']:>10.3f}"
+                f"{result['p95']:>10.3f}{result['p99']:>10.3f}"
+            )
+        if "pool" not in modes:
+            self.stdout.write("pool        skipped, the pool needs postgresql")
+
+    def run(self, mode, settings_dict, options):
+        # every thread gets its own wrapper like the thread of a server
+        backend = load_backend(settings_dict["ENGINE"])
+        alias = f"bench_connections_{mode}"
+
+        def worker(number):
+            latencies = []
+            connection = backend.DatabaseWrapper(settings_dict, alias)
+            for _ in range(options["requests"]):
+                started = time.perf_counter()
+                # what request_started and request_finished do around a view
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                connection.close_if_unusable_or_obsolete()
+                latencies.append(time.perf_counter() - started)
+            connection.close()
+            return latencies
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+                latencies = sorted(
+                    latency
+                    for thread_latencies in pool.map(worker, range(options["threads"]))
+                    for latency in thread_latencies
+                )
+            elapsed = time.perf_counter() - started
+        finally:
+            if mode == "pool":
+                backend.DatabaseWrapper(settings_dict, alias).close_pool()
+
+        return {
+            "rate": len(latencies) / elapsed,
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        }
@@ -0,0 +1,74 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import slugify
+
+from accounts.models import Patient
+from accounts.readers import ValuesReader
+from accounts.serializers import ProfilePatientSerializer
+
+
+class Command(BaseCommand):
+    """
+    this command will compare the rows per second of the patient list rendered by
+    ProfilePatientSerializer and by ValuesReader, the seeded rows are rolled back
+
+    """
+
+    help = "Benchmark the serializer and the values_list read paths of the patient list"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options["rows"])
+            serializer_rate = self.measure(self.serializer_path, options["repeat"])
+            reader_rate = self.measure(self.reader_path, options["repeat"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"serializer:    {serializer_rate:>12,.0f} rows/sec")
+        self.stdout.write(f"values reader: {reader_rate:>12,.0f} rows/sec")
+        self.stdout.write(
+            self.style.SUCCESS(f"speedup: {reader_rate / serializer_rate:.1f}x")
+        )
+
+    def seed(self, rows):
+        password = make_password("benchmark-password")
+        Patient.objects.bulk_create(
+            Patient(
+                user_name=f"bench-patient-{number}",
+                first_name="first",
+                last_name="last",
+                email=f"bench-patient-{number}@example.com",
+                password=password,
+                password_confirmation=password,
+                national_id_number=f"B{number:013d}",
+                address="address",
+                phone_number=f"B{number:010d}",
+                blood_type="A+",
+                gender="Male",
+                age=30,
+                slug=slugify(f"bench-patient-{number}"),
+            )
+            for number in range(rows)
+        )
+
+    def measure(self, path, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = len(path())
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return count / best
+
+    def serializer_path(self):
+        return ProfilePatientSerializer(Patient.objects.all(), many=True).data
+
+    def reader_path(self):
+        reader = ValuesReader.for_serializer(ProfilePatientSerializer())
+        return reader.render(reader.rows(Patient.objects.all()))
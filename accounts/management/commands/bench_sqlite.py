@@ -0,0 +1,164 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+from django.utils.text import slugify
+
+from accounts.loadtest import percentile
+from accounts.models import Patient
+from accounts.serializers import PatientSerializer
+
+
+BACKENDS = {
+    "default": "django.db.backends.sqlite3",
+    "wal": "project.sqlite",
+}
+
+
+def signup_data(number):
+    """this function will return the signup data of the benchmark patient of the number"""
+
+    return {
+        "user_name": f"bench-patient-{number}",
+        "first_name": "first",
+        "last_name": "last",
+        "email": f"bench-patient-{number}@example.com",
+        "password": "benchmark-password",
+        "password_confirmation": "benchmark-password",
+        "national_id_number": f"{number:014d}",
+        "address": "address",
+        "phone_number": f"0100{number:07d}",
+        "blood_type": "A+",
+        "gender": "Male",
+        "age": 30,
+    }
+
+
+class Command(BaseCommand):
+    """
+    this command will compare the default sqlite backend and the WAL backend of
+    project.sqlite under concurrent signups and profile reads, the signups run
+    through PatientSerializer and save() with the configured password hasher
+    like /accounts/signup/, every backend runs on its own migrated temporary
+    database that stands in for the default database of the command
+
+    """
+
+    help = "Benchmark concurrent signups and reads on the default and the WAL sqlite backends"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--operations", type=int, default=40, help="per thread")
+        parser.add_argument("--write-ratio", type=float, default=0.25)
+        parser.add_argument("--rows", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'backend':<10}{'ops/s':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        for label, engine in BACKENDS.items():
+            result = self.run(engine, options)
+            self.stdout.write(
+                f"{label:<10}{result['rate']:>10,.0f}{result['errors']:>8}"
+                f"{result['p50']:>10.2f}{result['p95']:>10.2f}{result['p99']:>10.2f}"
+            )
+
+    def run(self, engine, options):
+        directory = tempfile.mkdtemp()
+        default = connections.settings["default"]
+        connections["default"].close()
+        connections.settings["default"] = connections.configure_settings(
+            {"default": {"ENGINE": engine, "NAME": os.path.join(directory, "bench.db")}}
+        )["default"]
+        del connections["default"]
+
+        try:
+            # the welcome email of the after_signup task is kept in memory
+            with override_settings(
+                ACCOUNTS_TASK_BACKEND="immediate",
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            ):
+                call_command("migrate", verbosity=0)
+                self.seed(options["rows"])
+                latencies, errors = [], []
+                lock = threading.Lock()
+
+                def worker(number):
+                    thread_latencies, thread_errors = self.work(number, options)
+                    with lock:
+                        latencies.extend(thread_latencies)
+                        errors.append(thread_errors)
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+                    list(pool.map(worker, range(options["threads"])))
+                elapsed = time.perf_counter() - started
+        finally:
+            connections["default"].close()
+            del connections["default"]
+            connections.settings["default"] = default
+            shutil.rmtree(directory, ignore_errors=True)
+
+        latencies.sort()
+        return {
+            "rate": len(latencies) / elapsed,
+            "errors": sum(errors),
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        }
+
+    def seed(self, rows):
+        password = make_password("benchmark-password")
+        Patient.objects.bulk_create(
+            Patient(
+                **dict(
+                    signup_data(number),
+                    password=password,
+                    password_confirmation=password,
+                    slug=slugify(f"bench-patient-{number}"),
+                )
+            )
+            for number in range(rows)
+        )
+
+    def work(self, number, options):
+        """this function will run the operations of one thread on its own connection"""
+
+        generator = random.Random(number)
+        pks = list(Patient.objects.order_by().values_list("pk", flat=True))
+        latencies, errors = [], 0
+
+        try:
+            for operation in range(options["operations"]):
+                started = time.perf_counter()
+                try:
+                    if generator.random() < options["write_ratio"]:
+                        self.signup(
+                            options["rows"] + number * options["operations"] + operation
+                        )
+                    else:
+                        self.read(generator.choice(pks))
+                except OperationalError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+        finally:
+            connections["default"].close()
+        return latencies, errors
+
+    def signup(self, number):
+        serializer = PatientSerializer(data=signup_data(number))
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def read(self, pk):
+        Patient.objects.filter(pk=pk).first()
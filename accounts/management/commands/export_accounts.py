@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.exporting import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORTS,
+    FORMATS,
+    parse_created,
+    stream_export,
+)
+
+
+class Command(BaseCommand):
+    """this command will export the patients, doctors or pharmacists as NDJSON or CSV"""
+
+    help = "Export the patients, doctors or pharmacists as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument(
+            "--format", dest="file_format", choices=sorted(FORMATS), default="ndjson"
+        )
+        parser.add_argument("--created-after", help="inclusive date or datetime")
+        parser.add_argument("--created-before", help="exclusive date or datetime")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--output", help="write to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        filters = {"chunk_size": options["chunk_size"]}
+        try:
+            for bound in ("created_after", "created_before"):
+                if options[bound]:
+                    filters[bound] = parse_created(options[bound])
+        except ValueError as error:
+            raise CommandError(error)
+
+        lines = stream_export(options["kind"], options["file_format"], **filters)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.bulk_import import DEFAULT_CHUNK_SIZE, guess_format, import_patients
+
+
+class Command(BaseCommand):
+    """this command will import patients in bulk from a csv or jsonl file"""
+
+    help = "Import patients in bulk from a csv or jsonl file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="path of the csv or jsonl file")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=["csv", "jsonl"],
+            help="format of the file, guessed from the extension by default",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="number of rows validated and inserted together",
+        )
+        parser.add_argument(
+            "--hash-workers",
+            type=int,
+            help="processes hashing the passwords, ACCOUNTS_IMPORT_HASH_WORKERS by default",
+        )
+        parser.add_argument(
+            "--report", help="write the rejected rows to this json file"
+        )
+
+    def handle(self, *args, **options):
+        file_format = options["file_format"] or guess_format(options["path"])
+        if file_format is None:
+            raise CommandError("can not guess the format, use --format")
+
+        try:
+            with open(options["path"], "rb") as stream:
+                report = import_patients(
+                    stream,
+                    file_format,
+                    options["chunk_size"],
+                    workers=options["hash_workers"],
+                )
+        except OSError as error:
+            raise CommandError(error)
+
+        if options["report"]:
+            with open(options["report"], "w") as output:
+                json.dump(report.as_dict(), output, indent=2)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"created {report.created} patients, rejected {len(report.rejected)} rows"
+            )
+        )
@@ -0,0 +1,106 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.loadtest import (
+    ROLES,
+    Client,
+    build_scenarios,
+    compare,
+    run_scenario,
+    seeded,
+)
+from accounts.models import Specialization
+
+
+class Command(BaseCommand):
+    """
+    this command will load test the accounts API of a running server seeded by
+    seed_accounts, the server must use the same database as this command and run
+    with empty ACCOUNTS_LOGIN_IP_RATE and ACCOUNTS_LOGIN_EMAIL_RATE for the logins,
+    the committed loadtest-baseline.json was measured with the default seed,
+    --requests 200 --concurrency 8, runserver and the SQLITE_WAL backend on one cpu
+
+    """
+
+    help = "Load test the accounts API and compare the results with a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/accounts/")
+        parser.add_argument("--requests", type=int, default=200, help="per scenario")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--scenarios", help="comma separated names, all scenarios by default"
+        )
+        parser.add_argument("--baseline", default="loadtest-baseline.json")
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="save the results as the new baseline",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=20.0,
+            help="allowed regression in percent of the baseline",
+        )
+
+    def handle(self, *args, **options):
+        accounts = {
+            role: list(
+                seeded(model, role).order_by("id").values_list("id", "email")[:1000]
+            )
+            for role, (model, *_) in ROLES.items()
+        }
+        if not any(accounts.values()):
+            raise CommandError("no seeded accounts, run seed_accounts first")
+        specialization_ids = list(
+            Specialization.objects.order_by("id").values_list("id", flat=True)[:100]
+        )
+
+        client = Client(options["base_url"])
+        try:
+            scenarios = build_scenarios(client, accounts, specialization_ids)
+        except (OSError, RuntimeError) as error:
+            raise CommandError(error)
+
+        if options["scenarios"]:
+            wanted = set(options["scenarios"].split(","))
+            unknown = wanted - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f"unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in scenarios if scenario.name in wanted]
+
+        results = {}
+        self.stdout.write(
+            f"{'scenario':<28}{'requests':>9}{'errors':>8}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+        )
+        for scenario in scenarios:
+            result = run_scenario(
+                client, scenario, options["requests"], options["concurrency"]
+            )
+            results[scenario.name] = result
+            self.stdout.write(
+                f"{scenario.name:<28}{result['requests']:>9}{result['errors']:>8}"
+                f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+                f"{result['throughput_rps']:>10}"
+            )
+
+        baseline_path = options["baseline"]
+        if options["save_baseline"]:
+            with open(baseline_path, "w") as baseline_file:
+                json.dump(results, baseline_file, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"baseline saved to {baseline_path}"))
+            return
+
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline, options["threshold"])
+        if regressions:
+            raise CommandError("regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("no regressions"))
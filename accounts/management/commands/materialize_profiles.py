@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Doctor, Patient, Pharmacist
+from accounts.profiles import materialize_profiles
+
+
+KINDS = {"patients": Patient, "doctors": Doctor, "pharmacists": Pharmacist}
+
+
+class Command(BaseCommand):
+    """
+    this command will create the missing profiles of the accounts in batches of
+    primary keys, the signups save the accounts without their profiles
+
+    """
+
+    help = "Create the missing profiles of the patients, doctors and pharmacists"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind", action="append", choices=list(KINDS), help="all by default"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for kind in options["kind"] or KINDS:
+            model = KINDS[kind]
+            created, last = 0, 0
+            while True:
+                ids = list(
+                    model.objects.filter(pk__gt=last)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)[: options["batch_size"]]
+                )
+                if not ids:
+                    break
+                created += materialize_profiles(model.objects.filter(pk__in=ids))
+                last = ids[-1]
+            self.stdout.write(f"{created} {kind} profiles created")
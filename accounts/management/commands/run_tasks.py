@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.tasks import get_backend, run_pending
+
+
+class Command(BaseCommand):
+    """
+    this command will run the background tasks saved by the database task backend,
+    several workers can run side by side on postgresql
+
+    """
+
+    help = "Run the background tasks of the database task backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="seconds to wait when no task is due",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="stop when no task is due"
+        )
+
+    def handle(self, *args, **options):
+        if get_backend() != "database":
+            raise CommandError("the tasks are not saved, set ACCOUNTS_TASK_BACKEND")
+
+        total = 0
+        while True:
+            ran = run_pending(options["batch_size"])
+            total += ran
+            if not ran:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+        self.stdout.write(f"{total} tasks run")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.loadtest import SEED_PASSWORD, seed_accounts
+
+
+class Command(BaseCommand):
+    """
+    this command will seed the patients, doctors and pharmacists of the load test,
+    the accounts seeded before are replaced with --replace, only the accounts with
+    an email on the reserved seed domain are ever deleted
+
+    """
+
+    help = "Seed the accounts of the load test"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=1000)
+        parser.add_argument("--doctors", type=int, default=200)
+        parser.add_argument("--pharmacists", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="delete the accounts seeded before",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = seed_accounts(
+                options["patients"],
+                options["doctors"],
+                options["pharmacists"],
+                batch_size=options["batch_size"],
+                replace=options["replace"],
+            )
+        except ValueError as error:
+            raise CommandError(f"{error} (--replace)")
+        seeded = ", ".join(f"{count} {role}s" for role, count in counts.items())
+        self.stdout.write(
+            self.style.SUCCESS(f"seeded {seeded}, password: {SEED_PASSWORD}")
+        )
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+SQLITE_ENGINES = ("django.db.backends.sqlite3", "project.sqlite")
+
+
+def copy_database(source, target):
+    """this function will copy the sqlite database of source into target page by page"""
+
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        target_connection.close()
+        source_connection.close()
+
+
+class Command(BaseCommand):
+    """
+    this command will copy the sqlite default database into its sqlite replicas,
+    the stand-in of the replication to try the replica routing locally
+
+    """
+
+    help = "Copy the sqlite default database into the sqlite read replicas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database", action="append", help="a replica alias, all by default"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="copy again every this many seconds, once by default",
+        )
+
+    def handle(self, *args, **options):
+        replicas = options["database"] or settings.ACCOUNTS_READ_REPLICAS
+        if not replicas:
+            raise CommandError("no replicas, set DATABASE_REPLICA_URLS")
+
+        databases = [settings.DATABASES["default"]]
+        for alias in replicas:
+            if alias not in settings.ACCOUNTS_READ_REPLICAS:
+                raise CommandError(f"{alias} is not a read replica")
+            databases.append(settings.DATABASES[alias])
+        if any(database["ENGINE"] not in SQLITE_ENGINES for database in databases):
+            raise CommandError("the default database and the replicas must be sqlite")
+
+        source = databases[0]["NAME"]
+        while True:
+            for alias in replicas:
+                started = time.perf_counter()
+                copy_database(source, settings.DATABASES[alias]["NAME"])
+                elapsed = (time.perf_counter() - started) * 1000
+                self.stdout.write(f"copied default to {alias} in {elapsed:.1f} ms")
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,202 @@
+"""
+in this module we will collect the metrics of the requests in the process,
+the latency, the database queries and the response size of every route
+are aggregated in memory and rendered in the Prometheus text format at /metrics
+
+"""
+
+import threading
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.http import HttpResponse
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# the other methods are counted as "other", the method comes from the client
+# and every new label value would add series to the registry
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE"}
+
+
+class Histogram:
+    """this class will count the observations of a metric by bucket"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """this class will hold the counters and histograms of the process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.histograms = {}
+        self.descriptions = {}
+
+    def inc(self, name, labels, value=1, description=""):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.descriptions.setdefault(name, ("counter", description))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets, description=""):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.descriptions.setdefault(name, ("histogram", description))
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def render(self):
+        """this function will return the metrics in the Prometheus text format"""
+
+        lines = []
+        with self.lock:
+            for name, (kind, description) in sorted(self.descriptions.items()):
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+
+                if kind == "counter":
+                    for (key_name, labels), value in sorted(self.counters.items()):
+                        if key_name == name:
+                            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+
+                for (key_name, labels), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0]
+                ):
+                    if key_name != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        bucket_labels = labels + (("le", _number(bound)),)
+                        lines.append(f"{name}_bucket{_labels(bucket_labels)} {count}")
+                    inf_labels = labels + (("le", "+Inf"),)
+                    lines.append(
+                        f"{name}_bucket{_labels(inf_labels)} {histogram.count}"
+                    )
+                    lines.append(
+                        f"{name}_sum{_labels(labels)} {_number(histogram.sum)}"
+                    )
+                    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+class QueryCounter:
+    """this class will count the queries of a request and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    this class will record the latency, the database queries and the response size
+    of every request by route
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        labels = {
+            "route": match.view_name if match else "unmatched",
+            "method": request.method if request.method in METHODS else "other",
+        }
+
+        registry.inc(
+            "http_requests_total",
+            dict(labels, status=str(response.status_code)),
+            description="Requests by route, method and status.",
+        )
+        registry.observe(
+            "http_request_duration_seconds",
+            labels,
+            elapsed,
+            LATENCY_BUCKETS,
+            description="Request latency by route.",
+        )
+        registry.observe(
+            "http_request_db_queries",
+            labels,
+            counter.count,
+            QUERY_BUCKETS,
+            description="Database queries per request by route.",
+        )
+        registry.inc(
+            "http_request_db_seconds_total",
+            labels,
+            counter.duration,
+            description="Time spent in database queries by route.",
+        )
+        if not response.streaming:
+            registry.observe(
+                "http_response_size_bytes",
+                labels,
+                len(response.content),
+                SIZE_BUCKETS,
+                description="Response body size by route.",
+            )
+        return response
+
+
+def metrics_view(request):
+    """this function will return the metrics of the process for Prometheus"""
+
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0010_alter_doctorprofile_doctor_name_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="doctor",
+            index=models.Index(fields=["created_at", "id"], name="doctor_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="doctor",
+            index=models.Index(
+                condition=models.Q(("active", False)),
+                fields=["created_at", "id"],
+                name="doctor_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="doctorprofile",
+            index=models.Index(
+                fields=["created_at", "id"], name="doctorprofile_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(fields=["created_at", "id"], name="patient_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="patientprofile",
+            index=models.Index(
+                fields=["created_at", "id"], name="patientprofile_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pharmacist",
+            index=models.Index(
+                fields=["created_at", "id"], name="pharmacist_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pharmacist",
+            index=models.Index(
+                condition=models.Q(("active", False)),
+                fields=["created_at", "id"],
+                name="pharmacist_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pharmacistprofile",
+            index=models.Index(
+                fields=["created_at", "id"], name="pharmacistprofile_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="specialization",
+            index=models.Index(
+                fields=["created_at", "id"], name="specialization_created_idx"
+            ),
+        ),
+    ]
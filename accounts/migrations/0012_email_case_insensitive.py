@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:34
+
+import django.db.models.functions.text
+from django.db import migrations, models, transaction
+from django.db.models import F
+from django.db.models.functions import Lower, Trim
+
+
+BATCH_SIZE = 1000
+
+
+def normalize_emails(apps, schema_editor):
+    """
+    this function will save the existing emails in lower case, one batch per transaction,
+    two accounts whose emails only differ by case must be merged by hand before migrating
+
+    """
+
+    for model_name in ("Patient", "Doctor", "Pharmacist"):
+        model = apps.get_model("accounts", model_name)
+        pending = (
+            model.objects.using(schema_editor.connection.alias)
+            .annotate(normalized=Lower(Trim("email")))
+            .exclude(email=F("normalized"))
+            .order_by("pk")
+        )
+
+        last_pk = 0
+        while True:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                batch = list(pending.filter(pk__gt=last_pk)[:BATCH_SIZE])
+                if not batch:
+                    break
+
+                for account in batch:
+                    account.email = account.normalized
+                model.objects.using(schema_editor.connection.alias).bulk_update(
+                    batch, ["email"]
+                )
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0011_created_at_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="doctor",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                name="doctor_email_ci_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="patient",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                name="patient_email_ci_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="pharmacist",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                name="pharmacist_email_ci_uniq",
+            ),
+        ),
+    ]
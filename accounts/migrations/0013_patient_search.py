@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+# the separators removed from the phone numbers before they are indexed
+PHONE_SEPARATORS = [" ", "-", "+", "(", ")"]
+
+NAME_SQL = "first_name || ' ' || last_name || ' ' || user_name"
+
+
+def _digits_sql(column):
+    for separator in PHONE_SEPARATORS:
+        column = f"replace({column}, '{separator}', '')"
+    return column
+
+
+def _index_row_sql(row):
+    name = " || ' ' || ".join(
+        f"{row}.{column}" for column in ("first_name", "last_name", "user_name")
+    )
+    return (
+        f"INSERT INTO accounts_patient_search"
+        f"(rowid, name, phone_number, national_id_number) VALUES "
+        f"({row}.id, {name}, {_digits_sql(f'{row}.phone_number')}, {row}.national_id_number);"
+    )
+
+
+# sqlite drops the triggers of a table that a later migration rebuilds (AlterField
+# and the like), accounts.search.ensure_search_triggers creates them again and
+# fills the search table after every migrate, so keep both in step
+SQLITE_INDEX_SQL = [
+    "CREATE VIRTUAL TABLE accounts_patient_search USING fts5("
+    "name, phone_number, national_id_number, prefix='2 3 4')",
+    "INSERT INTO accounts_patient_search(rowid, name, phone_number, national_id_number) "
+    f"SELECT id, {NAME_SQL}, {_digits_sql('phone_number')}, national_id_number "
+    "FROM accounts_patient",
+    "CREATE TRIGGER accounts_patient_search_insert AFTER INSERT ON accounts_patient "
+    f"BEGIN {_index_row_sql('new')} END",
+    "CREATE TRIGGER accounts_patient_search_delete AFTER DELETE ON accounts_patient "
+    "BEGIN DELETE FROM accounts_patient_search WHERE rowid = old.id; END",
+    "CREATE TRIGGER accounts_patient_search_update AFTER UPDATE OF "
+    "first_name, last_name, user_name, phone_number, national_id_number "
+    "ON accounts_patient BEGIN "
+    "DELETE FROM accounts_patient_search WHERE rowid = old.id; "
+    f"{_index_row_sql('new')} END",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS accounts_patient_search_insert",
+    "DROP TRIGGER IF EXISTS accounts_patient_search_delete",
+    "DROP TRIGGER IF EXISTS accounts_patient_search_update",
+    "DROP TABLE IF EXISTS accounts_patient_search",
+]
+
+POSTGRESQL_INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX patient_name_trgm_idx ON accounts_patient "
+    f"USING gin (({NAME_SQL}) gin_trgm_ops)",
+    "CREATE INDEX patient_phone_prefix_idx ON accounts_patient "
+    "(phone_number varchar_pattern_ops)",
+    "CREATE INDEX patient_national_id_prefix_idx ON accounts_patient "
+    "(national_id_number varchar_pattern_ops)",
+]
+
+POSTGRESQL_DROP_SQL = [
+    "DROP INDEX IF EXISTS patient_name_trgm_idx",
+    "DROP INDEX IF EXISTS patient_phone_prefix_idx",
+    "DROP INDEX IF EXISTS patient_national_id_prefix_idx",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {
+        "sqlite": SQLITE_INDEX_SQL,
+        "postgresql": POSTGRESQL_INDEX_SQL,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {
+        "sqlite": SQLITE_DROP_SQL,
+        "postgresql": POSTGRESQL_DROP_SQL,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0012_email_case_insensitive"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
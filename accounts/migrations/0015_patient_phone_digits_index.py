@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+# the separators removed from the phone numbers before they are indexed
+PHONE_SEPARATORS = [" ", "-", "+", "(", ")"]
+
+
+def _digits_sql(column):
+    for separator in PHONE_SEPARATORS:
+        column = f"replace({column}, '{separator}', '')"
+    return column
+
+
+# on postgresql the phone prefixes are matched on the digits of the phone number,
+# the same form sqlite keeps in the search table of migration 0013
+POSTGRESQL_INDEX_SQL = [
+    "DROP INDEX IF EXISTS patient_phone_prefix_idx",
+    "CREATE INDEX patient_phone_prefix_idx ON accounts_patient "
+    f"(({_digits_sql('phone_number')}) varchar_pattern_ops)",
+]
+
+POSTGRESQL_DROP_SQL = [
+    "DROP INDEX IF EXISTS patient_phone_prefix_idx",
+    "CREATE INDEX patient_phone_prefix_idx ON accounts_patient "
+    "(phone_number varchar_pattern_ops)",
+]
+
+
+def create_digits_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in POSTGRESQL_INDEX_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_digits_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in POSTGRESQL_DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0014_task_queue"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_digits_index, drop_digits_index),
+    ]
@@ -1,11 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.text import slugify
-from django.contrib.auth.hashers import make_password
+from django.contrib.auth.hashers import identify_hasher, make_password
 from django.core.validators import MinLengthValidator
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models.signals import post_save
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from .cache import bump_specialization_version
 
 
 GENDER = [
@@ -18,6 +21,60 @@ SHIFT = [
     ("Evening", "Evening"),
 ]
 
+TASK_STATUS = [
+    ("pending", "Pending"),
+    ("running", "Running"),
+    ("failed", "Failed"),
+]
+
+IMPORT_STATUS = [
+    ("pending", "Pending"),
+    ("running", "Running"),
+    ("done", "Done"),
+    ("failed", "Failed"),
+]
+
+
+def normalize_email(email):
+    """
+    this function will return the email in the form it is saved in the database,
+    the emails are compared case insensitively so they are saved in lower case
+
+    """
+
+    return (email or "").strip().lower()
+
+
+def hash_password(password):
+    """
+    this function will hash the password once, a value that is already a django
+    password hash is kept as it is so a caller can hash it before the transaction
+
+    """
+
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return make_password(password)
+    return password
+
+
+class AccountQuerySet(models.QuerySet):
+    """
+    this class will hold the queries shared by the patient, doctor and pharmacist
+
+    """
+
+    def by_email(self, email):
+        """
+        this function will return the account of the email or None,
+        the default ordering is dropped so the lookup is a single probe of the email index
+
+        """
+
+        email = normalize_email(email)
+        return next(iter(self.filter(email=email).order_by()[:1]), None)
+
 
 class Patient(models.Model):
     """
@@ -43,6 +100,8 @@ class Patient(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     slug = models.SlugField(max_length=100, unique=True)
 
+    objects = AccountQuerySet.as_manager()
+
     class Meta:
         """
         this class will define the ordering of the patient
@@ -52,6 +111,12 @@ class Patient(models.Model):
         ordering = ["-created_at"]
         verbose_name_plural = "patients"
         verbose_name = "patient"
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="patient_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="patient_email_ci_uniq"),
+        ]
 
     def __str__(self):
         """
@@ -80,13 +145,15 @@ class Patient(models.Model):
 
         """
 
-        if not self.pk:
-            self.password = make_password(self.password)
-            self.password_confirmation = make_password(self.password_confirmation)
-
         if not self.slug:
             self.slug = slugify(self.user_name)
 
+        if not self.pk:
+            self.password = hash_password(self.password)
+            self.password_confirmation = self.password
+
+        self.email = normalize_email(self.email)
+
         super(Patient, self).save(*args, **kwargs)
 
 
@@ -121,6 +188,8 @@ class Doctor(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     slug = models.SlugField(max_length=100, unique=True)
 
+    objects = AccountQuerySet.as_manager()
+
     class Meta:
         """
         this class will define the ordering of the doctor
@@ -130,6 +199,17 @@ class Doctor(models.Model):
         ordering = ["-created_at"]
         verbose_name_plural = "Doctors"
         verbose_name = "Doctor"
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="doctor_created_idx"),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(active=False),
+                name="doctor_pending_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="doctor_email_ci_uniq"),
+        ]
 
     def __str__(self):
         """
@@ -167,9 +247,11 @@ class Doctor(models.Model):
             self.slug = slugify(self.user_name)
 
         if not self.pk:
-            self.password = make_password(self.password)
+            self.password = hash_password(self.password)
             self.password_confirmation = self.password
 
+        self.email = normalize_email(self.email)
+
         super(Doctor, self).save(*args, **kwargs)
 
 
@@ -198,6 +280,8 @@ class Pharmacist(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     slug = models.SlugField(max_length=100, unique=True)
 
+    objects = AccountQuerySet.as_manager()
+
     class Meta:
         """
         this class will define the ordering of the pharmacist
@@ -207,6 +291,17 @@ class Pharmacist(models.Model):
         ordering = ["-created_at"]
         verbose_name_plural = "Pharmacists"
         verbose_name = "Pharmacist"
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="pharmacist_created_idx"),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(active=False),
+                name="pharmacist_pending_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="pharmacist_email_ci_uniq"),
+        ]
 
     def __str__(self):
         """
@@ -240,9 +335,11 @@ class Pharmacist(models.Model):
             self.slug = slugify(self.user_name)
 
         if not self.pk:
-            self.password = make_password(self.password)
+            self.password = hash_password(self.password)
             self.password_confirmation = self.password
 
+        self.email = normalize_email(self.email)
+
         super(Pharmacist, self).save(*args, **kwargs)
 
 
@@ -266,6 +363,11 @@ class Specialization(models.Model):
         ordering = ["-created_at"]
         verbose_name_plural = "Specializations"
         verbose_name = "Specialization"
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="specialization_created_idx"
+            ),
+        ]
 
     def __str__(self):
         """
@@ -287,6 +389,19 @@ class Specialization(models.Model):
         super(Specialization, self).save(*args, **kwargs)
 
 
+@receiver([post_save, post_delete], sender=Specialization)
+def invalidate_specialization_cache(sender, **kwargs):
+    """
+    this function will invalidate the cached specializations when one is saved or deleted,
+    the version is bumped again after the commit so a reader that reloaded the
+    specializations before the commit does not keep the old rows
+
+    """
+
+    bump_specialization_version()
+    transaction.on_commit(bump_specialization_version)
+
+
 class PatientProfile(models.Model):
     """
     in this model we will create the patient_profile table in the database,
@@ -309,6 +424,11 @@ class PatientProfile(models.Model):
         ordering = ["-created_at"]
         verbose_name_plural = "Patients Profiles"
         verbose_name = "Patient Profile"
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="patientprofile_created_idx"
+            ),
+        ]
 
     def __str__(self):
         """
@@ -330,17 +450,6 @@ class PatientProfile(models.Model):
         super(PatientProfile, self).save(*args, **kwargs)
 
 
-@receiver(post_save, sender=Patient)
-def create_patient_profile(sender, instance, created, **kwargs):
-    """
-    this function will create the patient_profile when the patient is created
-
-    """
-
-    if created:
-        PatientProfile.objects.create(Patient_name=instance)
-
-
 class DoctorProfile(models.Model):
     """
     in this model we will create the doctor_profile table in the database,
@@ -358,6 +467,9 @@ class DoctorProfile(models.Model):
         ordering = ["-created_at"]
         verbose_name_plural = "Doctors Profiles"
         verbose_name = "Doctor Profile"
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="doctorprofile_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.doctor_name} profile"
@@ -372,12 +484,18 @@ class DoctorProfile(models.Model):
 @receiver(post_save, sender=Doctor)
 def create_doctor_profile(sender, instance, created, **kwargs):
     """
-    this function will create the doctor_profile when the doctor.active is True
+    this function will create the doctor_profile of a doctor created active
+    with one INSERT that skips an existing profile, the saves after the creation
+    cost no query, the doctors approved later get their profile from the bulk
+    approval or from the change form of the admin panel
 
     """
 
-    if instance.active:
-        DoctorProfile.objects.create(doctor_name=instance)
+    if created and instance.active:
+        DoctorProfile.objects.bulk_create(
+            [DoctorProfile(doctor_name=instance, slug=instance.slug)],
+            ignore_conflicts=True,
+        )
 
 
 class PharmacistProfile(models.Model):
@@ -397,6 +515,11 @@ class PharmacistProfile(models.Model):
         ordering = ["-created_at"]
         verbose_name_plural = "Pharmacists Profiles"
         verbose_name = "Pharmacist Profile"
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="pharmacistprofile_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.pharmacist_name} profile"
@@ -411,9 +534,97 @@ class PharmacistProfile(models.Model):
 @receiver(post_save, sender=Pharmacist)
 def create_pharmacist_profile(sender, instance, created, **kwargs):
     """
-    this function will create the pharmacist_profile when the pharmacist.active is True
+    this function will create the pharmacist_profile of a pharmacist created active
+    with one INSERT that skips an existing profile, the saves after the creation
+    cost no query, the pharmacists approved later get their profile from the bulk
+    approval or from the change form of the admin panel
+
+    """
+
+    if created and instance.active:
+        PharmacistProfile.objects.bulk_create(
+            [PharmacistProfile(pharmacist_name=instance, slug=instance.slug)],
+            ignore_conflicts=True,
+        )
+
+
+class Task(models.Model):
+    """
+    in this model we will create the task table in the database,
+    the queue of the background work of accounts.tasks, a task is deleted
+    once it ran and kept as failed after its last attempt
+
+    """
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=TASK_STATUS, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """
+        this class will define the indexes of the task, the workers walk the
+        pending tasks and the running tasks of the stopped workers only
+
+        """
+
+        verbose_name_plural = "Tasks"
+        verbose_name = "Task"
+        indexes = [
+            models.Index(
+                fields=["run_after", "id"],
+                condition=models.Q(status="pending"),
+                name="task_pending_idx",
+            ),
+            models.Index(
+                fields=["locked_at"],
+                condition=models.Q(status="running"),
+                name="task_running_idx",
+            ),
+        ]
+
+    def __str__(self):
+        """
+        this function will return the name and the status of the task in the admin panel
+
+        """
+
+        return f"{self.name} ({self.status})"
+
+
+class ImportJob(models.Model):
+    """
+    in this model we will create the import_job table in the database,
+    a bulk import of patients that runs in the background, the uploaded file
+    is kept until the import ran and the report of the rows is saved on the job
 
     """
 
-    if instance.active:
-        PharmacistProfile.objects.create(pharmacist_name=instance)
+    file = models.FileField(upload_to="imports/")
+    file_format = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=IMPORT_STATUS, default="pending")
+    report = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        this class will define the ordering of the import_job
+
+        """
+
+        ordering = ["-created_at"]
+        verbose_name_plural = "Import Jobs"
+        verbose_name = "Import Job"
+
+    def __str__(self):
+        """
+        this function will return the id and the status of the import job in the admin panel
+
+        """
+
+        return f"import {self.pk} ({self.status})"
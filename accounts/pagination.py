@@ -0,0 +1,37 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ProfileCursorPagination(CursorPagination):
+    """
+    this class will paginate the profile lists with a cursor on the
+    models ordering, newest first and tie broken by id, so every page
+    is one indexed range query whatever its depth
+
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, "ACCOUNTS_PAGE_SIZE", 20)
+        max_page_size = getattr(settings, "ACCOUNTS_MAX_PAGE_SIZE", 100)
+
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+
+        if requested <= 0:
+            return page_size
+        return min(requested, max_page_size)
+
+
+class PendingCursorPagination(ProfileCursorPagination):
+    """
+    this class will paginate the accounts waiting for approval oldest first,
+    the pages are range queries on the partial indexes of the inactive accounts
+
+    """
+
+    ordering = ("created_at", "id")
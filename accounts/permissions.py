@@ -0,0 +1,21 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+
+class IsAccountOwnerOrReadOnly(BasePermission):
+    """
+    this class will allow the authenticated accounts to read the profiles,
+    a profile can only be changed by its owner or by the staff
+
+    """
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated)
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in SAFE_METHODS or request.user.is_staff:
+            return True
+
+        return (
+            getattr(request.user, "role", None) == view.account_role
+            and request.user.pk == obj.pk
+        )
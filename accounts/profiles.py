@@ -0,0 +1,57 @@
+"""
+in this module we will create the missing profiles of the accounts in batches,
+a signup or an import saves the account only and its profile row is created later
+by materialize_profiles, from the materialize_missing_profiles task they queue,
+from the approval of the staff or from the materialize_profiles command,
+the doctors and pharmacists get a profile only while they are active
+
+"""
+
+from .models import (
+    Doctor,
+    DoctorProfile,
+    Patient,
+    PatientProfile,
+    Pharmacist,
+    PharmacistProfile,
+)
+
+
+# account model: (profile model, profile field, related name of the profile)
+PROFILES = {
+    Patient: (PatientProfile, "Patient_name", "patient_profile"),
+    Doctor: (DoctorProfile, "doctor_name", "doctor_profile"),
+    Pharmacist: (PharmacistProfile, "pharmacist_name", "pharmacist_profile"),
+}
+
+STAFF_MODELS = (Doctor, Pharmacist)
+
+
+def materialize_profiles(queryset, batch_size=None):
+    """
+    this function will create the missing profiles of the accounts of the queryset
+    with one SELECT and one bulk_create, the inactive doctors and pharmacists
+    are skipped, it returns the number of accounts that got a profile
+
+    """
+
+    profile_model, profile_field, related_name = PROFILES[queryset.model]
+    missing = queryset.order_by().filter(**{f"{related_name}__isnull": True})
+    if queryset.model in STAFF_MODELS:
+        missing = missing.filter(active=True)
+
+    rows = list(missing.values_list("pk", "slug"))
+    if not rows:
+        return 0
+
+    # the rows that conflict with an existing profile are skipped by the database,
+    # so the accounts still missing a profile are counted again after the insert
+    profile_model.objects.bulk_create(
+        [
+            profile_model(**{f"{profile_field}_id": pk, "slug": slug})
+            for pk, slug in rows
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    return len(rows) - missing.filter(pk__in=[pk for pk, _ in rows]).count()
@@ -0,0 +1,100 @@
+"""
+in this module we will render the read only lists of the profiles from
+QuerySet.values_list() rows, the serializer is only used once to know the
+fields, then every row is turned into a dict without building a model
+instance or running the serializer fields for it
+
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+# the fields whose to_representation returns the database value unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+# the columns the cursor pagination reads from the rows
+POSITION_COLUMNS = ("id", "created_at")
+
+
+class ValuesReader:
+    """
+    this class will hold the compiled extractors of a serializer class and field set
+
+    """
+
+    _compiled = {}
+
+    def __init__(self, model, names, columns, converters):
+        self.model = model
+        self.names = names
+        self.columns = columns + tuple(
+            column for column in POSITION_COLUMNS if column not in columns
+        )
+        self.converters = converters
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        """
+        this function will return the reader of the fields of the serializer,
+        or None when one of its fields can not be read from a column
+
+        """
+
+        key = (type(serializer), tuple(serializer.fields))
+        if key not in cls._compiled:
+            cls._compiled[key] = cls._compile(serializer)
+        return cls._compiled[key]
+
+    @classmethod
+    def _compile(cls, serializer):
+        model = serializer.Meta.model
+        names, columns, converters = [], [], []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if model_field.many_to_many or model_field.one_to_many:
+                return None
+
+            if not isinstance(field, PASSTHROUGH_FIELDS):
+                converters.append((len(names), field.to_representation))
+            names.append(name)
+            columns.append(model_field.attname)
+
+        return cls(model, tuple(names), tuple(columns), tuple(converters))
+
+    def rows(self, queryset):
+        """this function will return the queryset as named rows of the needed columns"""
+
+        return queryset.values_list(*self.columns, named=True)
+
+    def render_row(self, row):
+        """this function will return the representation of one row"""
+
+        if not self.converters:
+            return dict(zip(self.names, row))
+
+        values = list(row)
+        for index, convert in self.converters:
+            if values[index] is not None:
+                values[index] = convert(values[index])
+        return dict(zip(self.names, values))
+
+    def render(self, rows):
+        """this function will return the representations of the rows"""
+
+        if not self.converters:
+            names = self.names
+            return [dict(zip(names, row)) for row in rows]
+        return [self.render_row(row) for row in rows]
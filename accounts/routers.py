@@ -0,0 +1,163 @@
+"""
+in this module we will route the reads of the patients, doctors and pharmacists
+in the GET and HEAD requests of the profile viewsets to one read replica of
+ACCOUNTS_READ_REPLICAS per request, everything else (the sessions and users of
+the authentication included) stays on the default database, a client that wrote
+is pinned to the default database for ACCOUNTS_REPLICA_STICKY_SECONDS so it
+reads its own writes, by its access token or session cookie in the cache and
+by a cookie for the anonymous clients
+
+"""
+
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+STICKY_COOKIE = "replica_pin"
+SAFE_METHODS = ("GET", "HEAD")
+REPLICA_MODELS = {"accounts.patient", "accounts.doctor", "accounts.pharmacist"}
+
+
+class RoutingState:
+    """this class will hold the routing of the current request"""
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+        # the replica picked by the first read, so the reads of a request
+        # see the same replication lag
+        self.alias = None
+
+
+_state = contextvars.ContextVar("accounts_routing_state", default=None)
+
+
+def read_replicas():
+    """
+    this function will return the aliases of the replicas, a replica that is the test
+    mirror of the default database is left out since it is the default database
+
+    """
+
+    default_name = connections["default"].settings_dict["NAME"]
+    return [
+        alias
+        for alias in getattr(settings, "ACCOUNTS_READ_REPLICAS", [])
+        if connections[alias].settings_dict["TEST"].get("MIRROR") != "default"
+        or connections[alias].settings_dict["NAME"] != default_name
+    ]
+
+
+class ReplicaRouter:
+    """
+    this class will send the reads of the account models in the requests marked by
+    ReplicaRoutingMiddleware to a random replica, and every write to the default database
+
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state.replica
+            or state.wrote
+            or model._meta.label_lower not in REPLICA_MODELS
+        ):
+            return None
+        replicas = read_replicas()
+        if not replicas:
+            return None
+        if state.alias not in replicas:
+            state.alias = random.choice(replicas)
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the default database
+        databases = {"default", *read_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replicas get the schema from the default database
+        if db in getattr(settings, "ACCOUNTS_READ_REPLICAS", []):
+            return False
+        return None
+
+
+def pin_key(request):
+    """
+    this function will return the cache key of the pin of the client, from its
+    Authorization header or its session cookie, or None for an anonymous client,
+    the session and the user are not loaded for it
+
+    """
+
+    credential = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not credential:
+        return None
+    return f"replica_pin:{hashlib.sha256(credential.encode()).hexdigest()}"
+
+
+def is_pinned(request):
+    """this function will tell if the client wrote in the last sticky seconds"""
+
+    if STICKY_COOKIE in request.COOKIES:
+        return True
+    key = pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    this class will let the router read the safe requests of the views with
+    read_from_replica from the replicas, and pin the client to the default
+    database after a write
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote and read_replicas():
+            sticky = getattr(settings, "ACCOUNTS_REPLICA_STICKY_SECONDS", 5)
+            key = pin_key(request)
+            if key is not None:
+                cache.set(key, 1, timeout=sticky)
+            response.set_cookie(
+                STICKY_COOKIE, "1", max_age=sticky, httponly=True, samesite="Lax"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        view_class = getattr(view_func, "cls", None)
+        if (
+            state is not None
+            and request.method in SAFE_METHODS
+            and getattr(view_class, "read_from_replica", False)
+            and not is_pinned(request)
+        ):
+            state.replica = True
+        return None
@@ -0,0 +1,198 @@
+"""
+in this module we will search the patients by name, phone number and national id,
+on sqlite the patients are indexed in the FTS5 table accounts_patient_search,
+on postgresql in trigram and pattern indexes of the patient table, both are
+created by migration 0013 and kept up to date by the database on every write,
+the phone numbers are searched without their separators on both
+
+"""
+
+import re
+
+from django.db import connection, connections, transaction
+
+from .models import Patient
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# the expression of the names indexed by migration 0013
+NAME_SQL = "first_name || ' ' || last_name || ' ' || user_name"
+
+# the separators removed from the phone numbers before they are indexed
+PHONE_SEPARATORS = [" ", "-", "+", "(", ")"]
+
+
+def digits_sql(column):
+    """this function will return the SQL of the column without the phone separators"""
+
+    for separator in PHONE_SEPARATORS:
+        column = f"replace({column}, '{separator}', '')"
+    return column
+
+
+# the expression of the phone numbers indexed by migrations 0013 and 0015
+PHONE_DIGITS_SQL = digits_sql("phone_number")
+
+
+def _index_row_sql(row):
+    name = " || ' ' || ".join(
+        f"{row}.{column}" for column in ("first_name", "last_name", "user_name")
+    )
+    return (
+        "INSERT INTO accounts_patient_search"
+        "(rowid, name, phone_number, national_id_number) VALUES "
+        f"({row}.id, {name}, {digits_sql(f'{row}.phone_number')}, "
+        f"{row}.national_id_number);"
+    )
+
+
+# the triggers of migration 0013 that keep the FTS5 table in sync with the patients
+SQLITE_TRIGGERS = {
+    "accounts_patient_search_insert": (
+        "CREATE TRIGGER IF NOT EXISTS accounts_patient_search_insert "
+        f"AFTER INSERT ON accounts_patient BEGIN {_index_row_sql('new')} END"
+    ),
+    "accounts_patient_search_delete": (
+        "CREATE TRIGGER IF NOT EXISTS accounts_patient_search_delete "
+        "AFTER DELETE ON accounts_patient "
+        "BEGIN DELETE FROM accounts_patient_search WHERE rowid = old.id; END"
+    ),
+    "accounts_patient_search_update": (
+        "CREATE TRIGGER IF NOT EXISTS accounts_patient_search_update AFTER UPDATE OF "
+        "first_name, last_name, user_name, phone_number, national_id_number "
+        "ON accounts_patient BEGIN "
+        "DELETE FROM accounts_patient_search WHERE rowid = old.id; "
+        f"{_index_row_sql('new')} END"
+    ),
+}
+
+
+def ensure_search_triggers(using="default"):
+    """
+    this function will create again the sqlite search triggers that are missing
+    and fill the FTS5 table again, sqlite drops the triggers of a table when a
+    migration rebuilds it, it returns the names of the created triggers
+
+    """
+
+    database = connections[using]
+    if database.vendor != "sqlite":
+        return []
+
+    with database.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE name = 'accounts_patient_search' "
+            "OR (type = 'trigger' AND tbl_name = 'accounts_patient')"
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        # before migration 0013 there is no search table to keep in sync
+        if "accounts_patient_search" not in existing:
+            return []
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        if not missing:
+            return []
+
+        with transaction.atomic(using=using):
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            cursor.execute("DELETE FROM accounts_patient_search")
+            cursor.execute(
+                "INSERT INTO accounts_patient_search"
+                "(rowid, name, phone_number, national_id_number) "
+                f"SELECT id, {NAME_SQL}, {PHONE_DIGITS_SQL}, national_id_number "
+                "FROM accounts_patient"
+            )
+    return missing
+
+
+def _terms(query):
+    """this function will split the query into (is_number, term) pairs"""
+
+    query = query.strip()
+    if re.fullmatch(r"[\d\s+\-()]+", query):
+        # a phone number typed with separators is searched as one number
+        query = re.sub(r"\D", "", query)
+    return [(term.isdigit(), term) for term in re.findall(r"\w+", query)]
+
+
+def _sqlite_ids(terms, limit):
+    match = " AND ".join(
+        (
+            f'{{phone_number national_id_number}}: "{term}"*'
+            if is_number
+            else f'name: "{term}"*'
+        )
+        for is_number, term in terms
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid FROM accounts_patient_search "
+            "WHERE accounts_patient_search MATCH %s ORDER BY rank LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgresql_ids(terms, limit):
+    where, params = [], []
+    names = " ".join(term for is_number, term in terms if not is_number)
+    for is_number, term in terms:
+        if is_number:
+            where.append(f"({PHONE_DIGITS_SQL} LIKE %s OR national_id_number LIKE %s)")
+            params += [f"{term}%", f"{term}%"]
+    if names:
+        where.append(f"%s <%% ({NAME_SQL})")
+        params.append(names)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM accounts_patient WHERE {' AND '.join(where)} "
+            f"ORDER BY word_similarity(%s, {NAME_SQL}) DESC, id LIMIT %s",
+            params + [names, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, limit):
+    queryset = Patient.objects.order_by()
+    for is_number, term in terms:
+        if is_number:
+            queryset = queryset.filter(phone_number__startswith=term) | queryset.filter(
+                national_id_number__startswith=term
+            )
+        else:
+            queryset = (
+                queryset.filter(first_name__istartswith=term)
+                | queryset.filter(last_name__istartswith=term)
+                | queryset.filter(user_name__istartswith=term)
+            )
+    return list(queryset.values_list("id", flat=True)[:limit])
+
+
+def search_patient_ids(query, limit=DEFAULT_LIMIT):
+    """
+    this function will return the ids of the patients matching every term of the query,
+    best first, the number terms match the beginning of the phone number or the
+    national id and the other terms match the beginning of a word of the name
+
+    """
+
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    search = {
+        "sqlite": _sqlite_ids,
+        "postgresql": _postgresql_ids,
+    }.get(connection.vendor, _fallback_ids)
+    return search(terms, min(limit, MAX_LIMIT))
+
+
+def search_patients(query, limit=DEFAULT_LIMIT):
+    """this function will return the patients of search_patient_ids in the same order"""
+
+    ids = search_patient_ids(query, limit)
+    patients = Patient.objects.in_bulk(ids)
+    return [patients[pk] for pk in ids if pk in patients]
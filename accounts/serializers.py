@@ -1,19 +1,200 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.validators import UniqueValidator
+from django.db import IntegrityError, models, transaction
+from .cache import specializations_by_id
 from .models import *
+from .tasks import enqueue
 
 
-class PatientSerializer(serializers.ModelSerializer):
-    """this class will create the serializer of the patient model"""
+class NormalizedEmailField(serializers.EmailField):
+    """this class will normalize the email before the unique validator checks it"""
+
+    def to_internal_value(self, data):
+        return normalize_email(super().to_internal_value(data))
+
+
+class AccountSerializer(serializers.ModelSerializer):
+    """this class will be the base of the serializers of the patient, doctor and pharmacist"""
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.EmailField: NormalizedEmailField,
+    }
+
+
+class SignupSerializer(AccountSerializer):
+    """
+    this class will be the base of the signup serializers,
+    the unique fields are not checked with one query each before the insert,
+    the password is hashed before the transaction that inserts the account,
+    the violations of the database unique constraints are returned as errors
+    of the fields, the rest of the signup runs in the background as the
+    after_signup task
+
+    """
+
+    # the slug is made from the user_name so its violations belong to the user_name
+    unique_field_aliases = {"slug": "user_name"}
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(
+            field_name, model_field
+        )
+        if "validators" in field_kwargs:
+            field_kwargs["validators"] = [
+                validator
+                for validator in field_kwargs["validators"]
+                if not isinstance(validator, UniqueValidator)
+            ]
+        return field_class, field_kwargs
+
+    def create(self, validated_data):
+        # the password is hashed before the transaction so the write lock of the
+        # database is not held for the hash, save() keeps a hashed password as it is
+        password = hash_password(validated_data["password"])
+        validated_data.update(password=password, password_confirmation=password)
+        try:
+            with transaction.atomic():
+                account = super().create(validated_data)
+                enqueue("after_signup", account._meta.label_lower, account.pk)
+                return account
+        except IntegrityError as error:
+            errors = self.unique_violation_errors(error)
+            if not errors:
+                raise
+            raise serializers.ValidationError(errors)
+
+    def unique_violation_errors(self, error):
+        """this function will return the field errors of the unique constraints named in the error"""
+
+        model = self.Meta.model
+        message = str(error)
+        violated = [
+            field
+            for field in model._meta.fields
+            if field.unique
+            and not field.primary_key
+            and (
+                f"{model._meta.db_table}.{field.column}" in message
+                or f"({field.column})=" in message
+            )
+        ]
+        for constraint in model._meta.constraints:
+            if constraint.name in message:
+                violated += [
+                    model._meta.get_field(expression.name)
+                    for source in constraint.expressions
+                    for expression in source.flatten()
+                    if isinstance(expression, models.F)
+                ]
+
+        errors = {}
+        for field in violated:
+            field = model._meta.get_field(
+                self.unique_field_aliases.get(field.name, field.name)
+            )
+            errors[field.name] = [
+                field.error_messages["unique"]
+                % {
+                    "model_name": model._meta.verbose_name,
+                    "field_label": field.verbose_name,
+                }
+            ]
+        return errors
+
+
+def requested_fields(request, available):
+    """
+    this function will return the fields kept by the ?fields= and ?exclude= query parameters,
+    or None when the request does not ask for a sparse fieldset
+
+    """
+
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+
+    fields = request.query_params.get("fields")
+    exclude = request.query_params.get("exclude")
+    if not fields and not exclude:
+        return None
+
+    selected = list(available)
+    if fields:
+        wanted = {name.strip() for name in fields.split(",")}
+        selected = [name for name in selected if name in wanted]
+    if exclude:
+        unwanted = {name.strip() for name in exclude.split(",")}
+        selected = [name for name in selected if name not in unwanted]
+    return selected
+
+
+class SparseFieldsSerializerMixin:
+    """
+    this class will drop the fields that are not asked for by ?fields= or ?exclude=
+    when the serializer is used to read
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        selected = requested_fields(self.context.get("request"), self.fields)
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+
+class PatientSerializer(SignupSerializer):
+    """
+    this class will create the serializer of the patient model,
+    a signup costs one INSERT in a transaction, its after_signup task runs after it
+
+    """
 
     class Meta:
         model = Patient
         exclude = ["id", "slug", "created_at"]
 
 
-class DoctorSerializer(serializers.ModelSerializer):
-    """this class will create the serializer of the doctor model"""
+class CachedSpecializationField(serializers.PrimaryKeyRelatedField):
+    """
+    this class will check the specialization id against the map of the specializations
+    kept in the process instead of querying the database for every doctor
+
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        specialization = specializations_by_id().get(pk)
+        if specialization is None:
+            self.fail("does_not_exist", pk_value=data)
+        return specialization
+
+    def get_choices(self, cutoff=None):
+        specializations = list(specializations_by_id().values())
+        if cutoff is not None:
+            specializations = specializations[:cutoff]
+        return {
+            self.to_representation(item): self.display_value(item)
+            for item in specializations
+        }
 
-    specialization_id = serializers.PrimaryKeyRelatedField(
+
+class DoctorSerializer(SignupSerializer):
+    """
+    this class will create the serializer of the doctor model,
+    a signup costs one INSERT in a transaction, its after_signup task runs after it
+
+    """
+
+    specialization_id = CachedSpecializationField(
         queryset=Specialization.objects.all(), source="specialization", write_only=True
     )
 
@@ -29,7 +210,7 @@ class DoctorSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class DoctorProfileSerializer(serializers.ModelSerializer):
+class DoctorProfileSerializer(SparseFieldsSerializerMixin, AccountSerializer):
     """this class will create the serializer of the doctor profile model"""
 
     class Meta:
@@ -44,15 +225,19 @@ class DoctorProfileSerializer(serializers.ModelSerializer):
         ]
 
 
-class PharmacistSerializer(serializers.ModelSerializer):
-    """this class will create the serializer of the pharmacist model"""
+class PharmacistSerializer(SignupSerializer):
+    """
+    this class will create the serializer of the pharmacist model,
+    a signup costs one INSERT in a transaction, its after_signup task runs after it
+
+    """
 
     class Meta:
         model = Pharmacist
         exclude = ["id", "slug", "created_at"]
 
 
-class PharmacistProfileSerializer(serializers.ModelSerializer):
+class PharmacistProfileSerializer(SparseFieldsSerializerMixin, AccountSerializer):
     """this class will create the serializer of the pharmacist profile model"""
 
     class Meta:
@@ -67,6 +252,44 @@ class PharmacistProfileSerializer(serializers.ModelSerializer):
         ]
 
 
+class PendingDoctorSerializer(serializers.ModelSerializer):
+    """this class will create the serializer of the doctors waiting for approval"""
+
+    class Meta:
+        model = Doctor
+        fields = [
+            "id",
+            "user_name",
+            "first_name",
+            "last_name",
+            "email",
+            "specialization",
+            "membership_no",
+            "graduation_year",
+            "national_id_number",
+            "phone_number",
+            "created_at",
+        ]
+
+
+class PendingPharmacistSerializer(serializers.ModelSerializer):
+    """this class will create the serializer of the pharmacists waiting for approval"""
+
+    class Meta:
+        model = Pharmacist
+        fields = [
+            "id",
+            "user_name",
+            "first_name",
+            "last_name",
+            "email",
+            "shift",
+            "national_id_number",
+            "phone_number",
+            "created_at",
+        ]
+
+
 class SpecializationSerializer(serializers.ModelSerializer):
     """this class will create the serializer of the specialization model"""
 
@@ -75,7 +298,7 @@ class SpecializationSerializer(serializers.ModelSerializer):
         exclude = ["id", "slug", "created_at"]
 
 
-class ProfilePatientSerializer(serializers.ModelSerializer):
+class ProfilePatientSerializer(SparseFieldsSerializerMixin, AccountSerializer):
     """
     this class will create the serializer of the patient model
     to check if the patient profile already
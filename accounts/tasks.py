@@ -0,0 +1,291 @@
+"""
+in this module we will run the secondary work of the requests in the background,
+a view enqueues a task by name and returns, the task runs later with the backend
+of ACCOUNTS_TASK_BACKEND:
+
+    thread     the default, the task runs in a thread of the process after the commit,
+               nothing is saved so the tasks of a stopped process are lost
+    database   the task is saved in the task table in the transaction of the request
+               and run by the run_tasks worker command, retried with a backoff,
+               the tasks wait in the table while no worker runs
+    immediate  the task runs in the request right after the commit, for development
+
+"""
+
+import logging
+import queue
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import LATENCY_BUCKETS, registry
+from .models import ImportJob, Task
+from .profiles import materialize_profiles
+
+
+logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger("accounts.audit")
+
+BACKENDS = ("database", "thread", "immediate")
+
+TASKS = {}
+
+
+def task(function):
+    """this function will register the function as a task under its name"""
+
+    TASKS[function.__name__] = function
+    return function
+
+
+def get_backend():
+    backend = getattr(settings, "ACCOUNTS_TASK_BACKEND", "thread")
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown task backend {backend!r}")
+    return backend
+
+
+def enqueue(name, *args, once=False):
+    """
+    this function will queue the task of the name with the json serializable args,
+    the task is dropped with the transaction of the caller when it rolls back,
+    with once the task is not queued again while the same task waits to run,
+    for the batch tasks that do the work of every call queued before they start
+
+    """
+
+    if name not in TASKS:
+        raise KeyError(f"unknown task {name!r}")
+
+    backend = get_backend()
+    if backend == "database":
+        if (
+            once
+            and Task.objects.filter(
+                name=name, args=list(args), status="pending"
+            ).exists()
+        ):
+            return
+        Task.objects.create(name=name, args=list(args))
+    elif backend == "thread":
+        transaction.on_commit(lambda: _submit(name, args, once))
+    else:
+        transaction.on_commit(lambda: _run_logged(name, args))
+
+
+def execute(name, args):
+    """this function will run the task and record its duration and outcome"""
+
+    started = time.perf_counter()
+    outcome = "failed"
+    try:
+        TASKS[name](*args)
+        outcome = "done"
+    finally:
+        registry.inc(
+            "tasks_total",
+            {"task": name, "outcome": outcome},
+            description="Background tasks run by task and outcome.",
+        )
+        registry.observe(
+            "task_duration_seconds",
+            {"task": name},
+            time.perf_counter() - started,
+            LATENCY_BUCKETS,
+            description="Background task latency by task.",
+        )
+
+
+def _run_logged(name, args):
+    try:
+        execute(name, args)
+    except Exception:
+        logger.exception("task %s%r failed", name, tuple(args))
+
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+# the (name, args) of the tasks queued with once that did not start yet
+_waiting = set()
+
+
+def _submit(name, args, once=False):
+    global _worker
+
+    with _worker_lock:
+        if once:
+            if (name, args) in _waiting:
+                return
+            _waiting.add((name, args))
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_work_forever, name="accounts-tasks", daemon=True
+            )
+            _worker.start()
+    _queue.put((name, args, once))
+
+
+def _work_forever():
+    while True:
+        name, args, once = _queue.get()
+        if once:
+            with _worker_lock:
+                _waiting.discard((name, args))
+        close_old_connections()
+        try:
+            _run_logged(name, args)
+        finally:
+            _queue.task_done()
+
+
+def claim(batch_size):
+    """
+    this function will lock the next pending tasks that are due for this worker,
+    the tasks left running by a stopped worker go back to the queue first,
+    on postgresql the workers skip the tasks locked by each other
+
+    """
+
+    now = timezone.now()
+    timeout = getattr(settings, "ACCOUNTS_TASK_TIMEOUT", 300)
+
+    with transaction.atomic():
+        Task.objects.filter(
+            status="running", locked_at__lt=now - timedelta(seconds=timeout)
+        ).update(status="pending")
+
+        ids = list(
+            Task.objects.filter(status="pending", run_after__lte=now)
+            .order_by("run_after", "id")
+            .select_for_update(skip_locked=True)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        Task.objects.filter(pk__in=ids).update(
+            status="running", locked_at=now, attempts=F("attempts") + 1
+        )
+    tasks = Task.objects.in_bulk(ids)
+    return [tasks[pk] for pk in ids]
+
+
+def run_task(task):
+    """
+    this function will run a claimed task, a task that ran is deleted and a task
+    that raised is retried after ACCOUNTS_TASK_RETRY_DELAY times its attempts
+    until it has ACCOUNTS_TASK_MAX_ATTEMPTS, then it is kept as failed
+
+    """
+
+    try:
+        if task.name not in TASKS:
+            raise KeyError(f"unknown task {task.name!r}")
+        execute(task.name, task.args)
+    except Exception:
+        logger.exception("task %s failed on attempt %d", task, task.attempts)
+        task.last_error = traceback.format_exc()
+        task.locked_at = None
+        if task.attempts >= getattr(settings, "ACCOUNTS_TASK_MAX_ATTEMPTS", 5):
+            task.status = "failed"
+        else:
+            delay = getattr(settings, "ACCOUNTS_TASK_RETRY_DELAY", 30) * task.attempts
+            task.status = "pending"
+            task.run_after = timezone.now() + timedelta(seconds=delay)
+        task.save(update_fields=["status", "run_after", "locked_at", "last_error"])
+        return False
+
+    task.delete()
+    return True
+
+
+def run_pending(batch_size=10):
+    """this function will run one batch of the due tasks and return how many ran"""
+
+    tasks = claim(batch_size)
+    for claimed in tasks:
+        run_task(claimed)
+    return len(tasks)
+
+
+WELCOME_MESSAGES = {
+    "patient": "your account is ready, you can log in now.",
+    "doctor": "your account waits for the approval of the administration.",
+    "pharmacist": "your account waits for the approval of the administration.",
+}
+
+
+@task
+def after_signup(model_label, pk):
+    """
+    this function will do the work of a signup that the client does not wait for,
+    the welcome email and the audit record, an account deleted meanwhile is skipped,
+    the profile is created by the materialize_missing_profiles batch it queues
+
+    """
+
+    model = apps.get_model(model_label)
+    account = model.objects.filter(pk=pk).first()
+    if account is None:
+        return
+
+    send_mail(
+        "Welcome to the hospital",
+        f"Hello {account.first_name}, {WELCOME_MESSAGES[model._meta.model_name]}",
+        None,
+        [account.email],
+    )
+    audit_logger.info("signup %s %s %s", model._meta.model_name, pk, account.email)
+    if getattr(account, "active", True):
+        enqueue("materialize_missing_profiles", model_label, once=True)
+
+
+@task
+def materialize_missing_profiles(model_label):
+    """
+    this function will create the missing profiles of the accounts of the model
+    in one batch, the signups and the imports queue it once for all the accounts
+    saved while it waits
+
+    """
+
+    materialize_profiles(apps.get_model(model_label).objects.all())
+
+
+@task
+def run_import_job(pk):
+    """
+    this function will import the patients of the uploaded file of the import job,
+    the report is saved on the job and the file is deleted, a job that finished
+    is skipped and a job that failed is run again when the task is retried
+
+    """
+
+    # bulk_import imports this module through the serializers
+    from .bulk_import import import_patients
+
+    job = ImportJob.objects.exclude(status="done").filter(pk=pk).first()
+    if job is None:
+        return
+
+    job.status = "running"
+    job.save(update_fields=["status"])
+    try:
+        with job.file.open("rb") as stream:
+            report = import_patients(stream, job.file_format)
+    except Exception:
+        job.status = "failed"
+        job.save(update_fields=["status"])
+        raise
+
+    job.status = "done"
+    job.report = report.as_dict()
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "report", "finished_at"])
+    job.file.storage.delete(job.file.name)
@@ -1,3 +1,1867 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import MD5PasswordHasher, check_password, make_password
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.db.utils import load_backend
+from django.test import (
+    LiveServerTestCase,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from rest_framework.test import APIClient
+
+from .admin import EstimatedCountPaginator
+from .bulk_import import import_patients
+from .management.commands.sync_sqlite_replica import copy_database
+from .cache import specializations_by_id
+from .hashing import get_verifier
+from .loadtest import SEED_PASSWORD, Client, compare, percentile, seeded
+from .metrics import registry
+from .profiles import materialize_profiles
+from .models import *
+from .readers import ValuesReader
+from .search import ensure_search_triggers
+from .routers import STICKY_COOKIE, ReplicaRouter, RoutingState, is_pinned, pin_key
+from .routers import _state as routing_state
+from .serializers import DoctorSerializer
+from .tasks import TASKS, claim, enqueue, run_pending
+from .throttling import LOGIN_THROTTLES, check_login_rates, parse_rate
+from .tokens import issue_tokens
+
+
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+COUNTING_HASHERS = ["accounts.tests.CountingHasher"]
+
+
+class CountingHasher(MD5PasswordHasher):
+    """this class will count the number of key derivations of the tests"""
+
+    algorithm = "counting"
+    calls = 0
+
+    def encode(self, password, salt):
+        CountingHasher.calls += 1
+        return super().encode(password, salt)
+
+
+def patient_data(number, **overrides):
+    """this function will return the signup data of a patient"""
+
+    data = {
+        "user_name": f"patient{number}",
+        "first_name": "first",
+        "last_name": "last",
+        "email": f"patient{number}@example.com",
+        "password": "password123",
+        "password_confirmation": "password123",
+        "national_id_number": f"{number:014d}",
+        "address": "address",
+        "phone_number": f"0100{number:07d}",
+        "blood_type": "A+",
+        "gender": "Male",
+        "age": 30,
+    }
+    data.update(overrides)
+    return data
+
+
+def doctor_data(number, specialization, **overrides):
+    """this function will return the signup data of a doctor"""
+
+    data = patient_data(number)
+    del data["blood_type"]
+    data.update(
+        specialization_id=specialization.pk,
+        membership_no=f"M{number}",
+        graduation_year=2010,
+    )
+    data.update(overrides)
+    return data
+
+
+def pharmacist_data(number, **overrides):
+    """this function will return the signup data of a pharmacist"""
+
+    data = patient_data(number)
+    del data["blood_type"]
+    data["shift"] = "Morning"
+    data.update(overrides)
+    return data
+
+
+def csv_file(rows):
+    """this function will return the rows as an in memory csv file"""
+
+    header = ",".join(rows[0].keys())
+    lines = [header] + [",".join(str(value) for value in row.values()) for row in rows]
+    return io.BytesIO(("\n".join(lines) + "\n").encode())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ACCOUNTS_IMPORT_HASH_WORKERS=1)
+class BulkImportPatientsTests(TestCase):
+    """this class will test the bulk import of the patients"""
+
+    def test_import_creates_patients_without_profiles(self):
+        report = import_patients(
+            csv_file([patient_data(number) for number in range(5)]), "csv", chunk_size=2
+        )
+
+        self.assertEqual(report.created, 5)
+        self.assertEqual(report.rejected, [])
+        self.assertEqual(Patient.objects.count(), 5)
+        self.assertEqual(PatientProfile.objects.count(), 0)
+
+        patient = Patient.objects.get(user_name="patient3")
+        self.assertTrue(patient.password.startswith("md5$"))
+        self.assertEqual(patient.password, patient.password_confirmation)
+        materialize_profiles(Patient.objects.all())
+        self.assertEqual(
+            PatientProfile.objects.get(Patient_name=patient).slug, "patient3"
+        )
+
+    def test_import_rejects_duplicates_and_invalid_rows(self):
+        Patient.objects.create(**patient_data(0))
+        rows = [
+            patient_data(0, user_name="other", phone_number="01999999999"),
+            patient_data(1),
+            patient_data(2, email="patient1@example.com"),
+            patient_data(3, gender="Unknown"),
+            patient_data(4, password_confirmation="different1"),
+        ]
+        stream = io.BytesIO("\n".join(json.dumps(row) for row in rows).encode())
+
+        with self.assertNumQueries(5 + 2 + 1):
+            report = import_patients(stream, "jsonl")
+
+        rejected = {row["line"]: row["errors"] for row in report.rejected}
+        self.assertEqual(report.created, 1)
+        self.assertEqual(sorted(rejected), [1, 3, 4, 5])
+        self.assertIn("email", rejected[1])
+        self.assertIn("national_id_number", rejected[1])
+        self.assertEqual(list(rejected[3]), ["email"])
+        self.assertIn("gender", rejected[4])
+        self.assertIn("password_confirmation", rejected[5])
+
+    def test_import_hashes_in_a_process_pool(self):
+        rows = [patient_data(number) for number in range(4)]
+        rows[1]["password"] = make_password("exported123")
+        rows[1]["password_confirmation"] = rows[1]["password"]
+
+        report = import_patients(csv_file(rows), "csv", workers=2)
+
+        self.assertEqual(report.created, 4)
+        hashes = dict(Patient.objects.values_list("user_name", "password"))
+        self.assertEqual(hashes["patient1"], rows[1]["password"])
+        self.assertTrue(check_password("password123", hashes["patient2"]))
+
+    def test_conflicting_chunk_falls_back_to_single_rows(self):
+        rows = [patient_data(number) for number in range(3)]
+        # a patient saved between the duplicate checks and the insert of the chunk
+        with mock.patch(
+            "accounts.bulk_import._drop_duplicates",
+            side_effect=lambda valid, seen, report: valid,
+        ):
+            Patient.objects.create(**patient_data(9, email="patient1@example.com"))
+            report = import_patients(csv_file(rows), "csv")
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual(
+            report.rejected,
+            [
+                {
+                    "line": 3,
+                    "errors": {"email": ["patient with this email already exists."]},
+                }
+            ],
+        )
+        self.assertEqual(
+            set(Patient.objects.values_list("user_name", flat=True)),
+            {"patient0", "patient2", "patient9"},
+        )
+
+    def test_import_endpoint_requires_admin(self):
+        client = APIClient()
+        url = reverse("accounts:bulk_import_patients")
+        upload = SimpleUploadedFile("patients.csv", csv_file([patient_data(1)]).read())
+
+        response = client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 401)
+
+        admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        client.force_authenticate(admin)
+        upload.seek(0)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with self.settings(MEDIA_ROOT=media, ACCOUNTS_TASK_BACKEND="immediate"):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = client.post(url, {"file": upload}, format="multipart")
+
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data["status"], "pending")
+            self.assertFalse(Patient.objects.exists())
+
+            # the import queues the batch of the profiles of its patients
+            with self.captureOnCommitCallbacks(execute=True):
+                for callback in callbacks:
+                    callback()
+
+        patient = Patient.objects.get(user_name="patient1")
+        self.assertTrue(PatientProfile.objects.filter(Patient_name=patient).exists())
+        response = client.get(
+            reverse("accounts:import_job", args=[response.data["job"]])
+        )
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(response.data["report"]["created"], 1)
+        self.assertEqual(os.listdir(os.path.join(media, "imports")), [])
+
+
+@override_settings(PASSWORD_HASHERS=COUNTING_HASHERS)
+class SignupHashingTests(TestCase):
+    """this class will check that every signup derives the password key only once"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.specialization = Specialization.objects.create(name="Cardiology")
+        CountingHasher.calls = 0
+
+    def assertHashedOnce(self, url, data, model):
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(CountingHasher.calls, 1)
+        account = model.objects.get(email=data["email"])
+        self.assertTrue(account.password.startswith("counting$"))
+        self.assertEqual(account.password, account.password_confirmation)
+
+    def test_patient_signup_hashes_once(self):
+        self.assertHashedOnce(reverse("accounts:signup"), patient_data(1), Patient)
+
+    def test_doctor_signup_hashes_once(self):
+        self.assertHashedOnce(
+            reverse("accounts:doctor_signup-list"),
+            doctor_data(1, self.specialization),
+            Doctor,
+        )
+
+    def test_pharmacist_signup_hashes_once(self):
+        self.assertHashedOnce(
+            reverse("accounts:Pharmacist_signup-list"), pharmacist_data(1), Pharmacist
+        )
+
+    def test_password_is_hashed_before_the_transaction(self):
+        encode = CountingHasher.encode
+        queries_at_hash = []
+
+        with CaptureQueriesContext(connection) as context:
+
+            def recording_encode(hasher, password, salt):
+                queries_at_hash.append(len(context.captured_queries))
+                return encode(hasher, password, salt)
+
+            with mock.patch.object(CountingHasher, "encode", recording_encode):
+                response = self.client.post(
+                    reverse("accounts:signup"), patient_data(1), format="json"
+                )
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(queries_at_hash, [0])
+        self.assertTrue(context.captured_queries[0]["sql"].startswith("SAVEPOINT"))
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    ACCOUNTS_LOGIN_HASH_WORKERS=1,
+    ACCOUNTS_LOGIN_HASH_QUEUE_SIZE=0,
+    ACCOUNTS_LOGIN_RETRY_AFTER=7,
+)
+class BoundedPasswordVerifierTests(TestCase):
+    """this class will test the login with the password verification pool enabled"""
+
+    def setUp(self):
+        self.client = APIClient()
+        Patient.objects.create(**patient_data(1))
+        self.url = reverse("accounts:login")
+        self.credentials = {"email": "patient1@example.com", "password": "password123"}
+
+    def test_login_verifies_in_the_pool(self):
+        response = self.client.post(self.url, self.credentials, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        wrong = dict(self.credentials, password="wrong-password")
+        response = self.client.post(self.url, wrong, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_returns_503_when_the_pool_is_full(self):
+        verifier = get_verifier()
+        verifier.slots.acquire()
+        try:
+            response = self.client.post(self.url, self.credentials, format="json")
+        finally:
+            verifier.slots.release()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SignedTokenTests(TestCase):
+    """this class will test the tokens issued by the login endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.patient = Patient.objects.create(**patient_data(1))
+        self.other = Patient.objects.create(**patient_data(2))
+
+    def login(self):
+        response = self.client.post(
+            reverse("accounts:login"),
+            {"email": "patient1@example.com", "password": "password123"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_login_returns_tokens(self):
+        data = self.login()
+
+        self.assertEqual(data["user_name"], "patient1")
+        self.assertEqual(data["token_type"], "Bearer")
+        self.assertIn("access", data)
+        self.assertIn("refresh", data)
+
+    def test_profile_endpoints_require_a_token(self):
+        url = reverse("accounts:update_patient_profile-detail", args=[self.patient.pk])
+
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_expired_access_token_is_rejected(self):
+        url = reverse("accounts:update_patient_profile-detail", args=[self.patient.pk])
+        access = issue_tokens(self.patient)["access"]
+
+        with override_settings(ACCOUNTS_ACCESS_TOKEN_LIFETIME=-1):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+            self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_only_the_owner_can_update_the_profile(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+
+        url = reverse("accounts:update_patient_profile-detail", args=[self.other.pk])
+        response = self.client.patch(url, {"address": "changed"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        url = reverse("accounts:update_patient_profile-detail", args=[self.patient.pk])
+        response = self.client.patch(url, {"address": "changed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_token_returns_new_tokens(self):
+        url = reverse("accounts:token_refresh")
+
+        response = self.client.post(
+            url, {"refresh": self.login()["refresh"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.data)
+
+        response = self.client.post(url, {"refresh": "bad"}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_inactive_doctor_can_not_refresh(self):
+        specialization = Specialization.objects.create(name="Cardiology")
+        doctor = Doctor.objects.create(**doctor_data(3, specialization))
+        refresh = issue_tokens(doctor)["refresh"]
+
+        response = self.client.post(
+            reverse("accounts:token_refresh"), {"refresh": refresh}, format="json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS, ACCOUNTS_PAGE_SIZE=2, ACCOUNTS_MAX_PAGE_SIZE=3
+)
+class ProfilePaginationTests(TestCase):
+    """this class will test the cursor pagination of the profile lists"""
+
+    def setUp(self):
+        patients = [
+            Patient.objects.create(**patient_data(number)) for number in range(5)
+        ]
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {issue_tokens(patients[0])['access']}"
+        )
+        self.url = reverse("accounts:update_patient_profile-list")
+
+    def test_pages_walk_the_whole_table_newest_first(self):
+        user_names = []
+        url = self.url
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            user_names += [row["user_name"] for row in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(
+            user_names, [f"patient{number}" for number in range(4, -1, -1)]
+        )
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(self.url, {"page_size": 50})
+        self.assertEqual(len(response.data["results"]), 3)
+
+        response = self.client.get(self.url, {"page_size": "bad"})
+        self.assertEqual(len(response.data["results"]), 2)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is sqlite specific")
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class QueryPlanTests(TestCase):
+    """this class will check that the hot queries are answered from an index"""
+
+    def assertIndexed(self, action):
+        with CaptureQueriesContext(connection) as context:
+            result = action()
+
+        selects = [
+            q["sql"] for q in context.captured_queries if q["sql"].startswith("SELECT")
+        ]
+        self.assertTrue(selects)
+        with connection.cursor() as cursor:
+            for sql in selects:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for step in (row[-1] for row in cursor.fetchall()):
+                    self.assertNotIn("TEMP B-TREE", step, sql)
+                    if step.startswith("SCAN"):
+                        self.assertIn("USING", step, sql)
+        return result
+
+    def test_login_lookups_probe_the_email_index(self):
+        for model in (Patient, Doctor, Pharmacist):
+            self.assertIndexed(lambda: model.objects.by_email("a@example.com"))
+
+    def test_profile_list_pages_use_the_created_at_index(self):
+        patients = [
+            Patient.objects.create(**patient_data(number)) for number in range(5)
+        ]
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {issue_tokens(patients[0])['access']}"
+        )
+        url = reverse("accounts:update_patient_profile-list")
+
+        response = self.assertIndexed(lambda: client.get(url, {"page_size": 2}))
+        self.assertIndexed(lambda: client.get(response.data["next"]))
+
+    def test_pending_queue_uses_the_partial_index(self):
+        for model in (Doctor, Pharmacist):
+            self.assertIndexed(
+                lambda: list(
+                    model.objects.filter(active=False).order_by("created_at", "id")[:20]
+                )
+            )
+
+    def test_pending_endpoint_pages_use_the_partial_index(self):
+        specialization = Specialization.objects.create(name="Cardiology")
+        for number in range(3):
+            Doctor.objects.create(**doctor_data(number, specialization))
+        client = APIClient()
+        client.force_authenticate(User(is_staff=True))
+        url = reverse("accounts:pending_staff", args=["doctors"])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.assertIndexed(lambda: client.get(url, {"page_size": 2}))
+            self.assertIndexed(lambda: client.get(response.data["next"]))
+
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = " ".join(row[-1] for row in cursor.fetchall())
+                self.assertIn("doctor_pending_idx", plan)
+
+    def test_task_claims_use_the_partial_indexes(self):
+        for number in range(3):
+            Task.objects.create(name="after_signup", args=["accounts.patient", number])
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(len(claim(2)), 2)
+
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query["sql"].startswith(("SELECT", "UPDATE")):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = " ".join(row[-1] for row in cursor.fetchall())
+                self.assertNotIn("TEMP B-TREE", plan)
+                self.assertNotIn("SCAN", plan)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class EmailNormalizationTests(TestCase):
+    """this class will test that the emails are compared case insensitively"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_signup_saves_the_email_in_lower_case(self):
+        data = patient_data(1, email=" Patient1@Example.COM")
+        response = self.client.post(reverse("accounts:signup"), data, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Patient.objects.get().email, "patient1@example.com")
+
+    def test_signup_rejects_an_email_in_another_case(self):
+        Patient.objects.create(**patient_data(1))
+
+        data = patient_data(2, email="PATIENT1@example.com")
+        response = self.client.post(reverse("accounts:signup"), data, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.data)
+
+    def test_login_ignores_the_email_case(self):
+        Patient.objects.create(**patient_data(1))
+
+        response = self.client.post(
+            reverse("accounts:login"),
+            {"email": "Patient1@EXAMPLE.com", "password": "password123"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_database_rejects_emails_differing_by_case(self):
+        Patient.objects.create(**patient_data(1))
+
+        with self.assertRaises(IntegrityError):
+            Patient.objects.bulk_create(
+                [Patient(**dict(patient_data(2), email="PATIENT1@example.com"))]
+            )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SignupQueryBudgetTests(TestCase):
+    """
+    this class will lock the number of queries of the signups with the default
+    task backend, the SAVEPOINT and RELEASE queries come from the transaction of
+    the signup inside the transaction of the test
+
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.specialization = Specialization.objects.create(name="Cardiology")
+        specializations_by_id()
+
+    def signup(self, url, data, queries):
+        with self.assertNumQueries(queries):
+            return self.client.post(url, data, format="json")
+
+    def test_patient_signup_query_budget(self):
+        response = self.signup(reverse("accounts:signup"), patient_data(1), 3)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Task.objects.exists())
+
+    def test_doctor_signup_query_budget(self):
+        url = reverse("accounts:doctor_signup-list")
+        response = self.signup(url, doctor_data(1, self.specialization), 3)
+        self.assertEqual(response.status_code, 201)
+
+    def test_pharmacist_signup_query_budget(self):
+        url = reverse("accounts:Pharmacist_signup-list")
+        response = self.signup(url, pharmacist_data(1), 3)
+        self.assertEqual(response.status_code, 201)
+
+    def test_unique_violations_are_field_errors(self):
+        Patient.objects.create(**patient_data(1))
+        url = reverse("accounts:signup")
+
+        response = self.signup(url, patient_data(2, phone_number="01000000001"), 4)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ["phone_number"])
+
+        response = self.client.post(url, patient_data(3, user_name="Patient1"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["user_name"], ["patient with this user name already exists."]
+        )
+        self.assertEqual(Patient.objects.count(), 1)
+        self.assertEqual(PatientProfile.objects.count(), 0)
+
+    def test_doctor_unique_violations_are_field_errors(self):
+        Doctor.objects.create(**doctor_data(1, self.specialization))
+
+        response = self.client.post(
+            reverse("accounts:doctor_signup-list"),
+            doctor_data(2, self.specialization, membership_no="M1"),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ["membership_no"])
+
+
+class SpecializationCacheTests(TestCase):
+    """this class will test the cached responses of the specializations"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.specialization = Specialization.objects.create(name="Cardiology")
+        self.url = reverse("accounts:specialization-list")
+
+    def test_list_is_served_from_the_cache(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, [{"name": "Cardiology"}])
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertTrue(second["ETag"].startswith('"'))
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_save_and_delete_invalidate_the_cache(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        Specialization.objects.create(name="Neurology")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+        detail = reverse(
+            "accounts:specialization-detail", args=[self.specialization.pk]
+        )
+        self.assertEqual(self.client.get(detail).data, {"name": "Cardiology"})
+        self.specialization.delete()
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        self.assertEqual(len(self.client.get(self.url).data), 1)
+
+
+class CachedSpecializationFieldTests(TestCase):
+    """this class will test the specialization lookup kept in the process"""
+
+    def setUp(self):
+        self.specialization = Specialization.objects.create(name="Cardiology")
+
+    def validate(self, specialization_id):
+        data = doctor_data(1, self.specialization, specialization_id=specialization_id)
+        serializer = DoctorSerializer(data=data)
+        serializer.is_valid()
+        return serializer
+
+    def test_specialization_is_checked_without_queries(self):
+        specializations_by_id()
+
+        with self.assertNumQueries(0):
+            valid = self.validate(self.specialization.pk)
+            missing = self.validate(self.specialization.pk + 100)
+            wrong_type = self.validate("abc")
+
+        self.assertEqual(valid.validated_data["specialization"], self.specialization)
+        self.assertIn("specialization_id", missing.errors)
+        self.assertIn("specialization_id", wrong_type.errors)
+
+    def test_saved_and_deleted_specializations_are_seen(self):
+        specializations_by_id()
+
+        neurology = Specialization.objects.create(name="Neurology")
+        self.assertNotIn("specialization_id", self.validate(neurology.pk).errors)
+
+        neurology.delete()
+        self.assertIn("specialization_id", self.validate(neurology.pk).errors)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SparseFieldsTests(TestCase):
+    """this class will test the ?fields= and ?exclude= query parameters of the profiles"""
+
+    def setUp(self):
+        specialization = Specialization.objects.create(name="Cardiology")
+        self.doctor = Doctor.objects.create(**doctor_data(1, specialization))
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {issue_tokens(self.doctor)['access']}"
+        )
+        self.url = reverse("accounts:update_doctor_profile-list")
+
+    def get(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"][0], context.captured_queries[0]["sql"]
+
+    def test_fields_limit_the_payload_and_the_columns(self):
+        row, sql = self.get({"fields": "first_name,specialization"})
+
+        self.assertEqual(
+            row,
+            {"first_name": "first", "specialization": self.doctor.specialization_id},
+        )
+        self.assertIn('"first_name"', sql)
+        self.assertIn('"specialization_id"', sql)
+        self.assertNotIn('"address"', sql)
+        self.assertNotIn('"password"', sql)
+
+    def test_exclude_drops_fields(self):
+        row, sql = self.get({"exclude": "address,membership_no"})
+
+        self.assertNotIn("address", row)
+        self.assertNotIn("membership_no", row)
+        self.assertIn("first_name", row)
+        self.assertNotIn('"address"', sql)
+
+    def test_full_payload_without_parameters(self):
+        row, _ = self.get({})
+        self.assertIn("address", row)
+        self.assertNotIn("password", row)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ACCOUNTS_PAGE_SIZE=2)
+class FastListTests(TestCase):
+    """this class will check that the fast list path renders the same payload"""
+
+    def setUp(self):
+        specialization = Specialization.objects.create(name="Cardiology")
+        for number in range(3):
+            Patient.objects.create(**patient_data(number))
+            Doctor.objects.create(**doctor_data(number, specialization))
+            Pharmacist.objects.create(**pharmacist_data(number))
+
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {issue_tokens(Patient.objects.first())['access']}"
+        )
+
+    def pages(self, name, params):
+        results = []
+        url = reverse(f"accounts:{name}-list")
+        while url:
+            response = self.client.get(url, params)
+            results += response.data["results"]
+            url, params = response.data["next"], None
+        return results
+
+    def test_fast_list_matches_the_serializers(self):
+        for name in (
+            "update_patient_profile",
+            "update_doctor_profile",
+            "update_pharmacist_profile",
+        ):
+            for params in ({}, {"fields": "user_name,age"}):
+                expected = self.pages(name, params)
+                with self.settings(ACCOUNTS_FAST_LIST=True), mock.patch.object(
+                    ValuesReader,
+                    "render",
+                    autospec=True,
+                    side_effect=ValuesReader.render,
+                ) as render:
+                    self.assertEqual(self.pages(name, params), expected)
+                self.assertEqual(render.call_count, 2)
+                self.assertEqual(len(expected), 3)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ExportTests(TestCase):
+    """this class will test the streaming export of the accounts"""
+
+    def setUp(self):
+        for number in range(3):
+            Patient.objects.create(**patient_data(number))
+        admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def export(self, **params):
+        response = self.client.get(
+            reverse("accounts:export_accounts", args=["patients"]), params
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_export(self):
+        rows = [json.loads(line) for line in self.export().splitlines()]
+
+        self.assertEqual(
+            [row["user_name"] for row in rows], ["patient0", "patient1", "patient2"]
+        )
+        self.assertNotIn("password", rows[0])
+        self.assertIn("created_at", rows[0])
+
+    def test_csv_export_with_created_at_range(self):
+        patients = list(Patient.objects.order_by("created_at"))
+        lines = self.export(
+            output="csv",
+            created_after=patients[1].created_at.isoformat(),
+            created_before=patients[2].created_at.isoformat(),
+        ).splitlines()
+
+        self.assertEqual(lines[0].split(",")[:2], ["id", "user_name"])
+        self.assertEqual(len(lines), 2)
+        self.assertIn("patient1", lines[1])
+
+    def test_export_rejects_bad_parameters(self):
+        url = reverse("accounts:export_accounts", args=["patients"])
+
+        self.assertEqual(self.client.get(url, {"output": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"created_after": "x"}).status_code, 400)
+        url = reverse("accounts:export_accounts", args=["nurses"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_export_command(self):
+        output = io.StringIO()
+        call_command("export_accounts", "patients", "--format", "csv", stdout=output)
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith("id,user_name"))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class PatientSearchTests(TestCase):
+    """this class will test the indexed search of the patients"""
+
+    def setUp(self):
+        Patient.objects.create(
+            **patient_data(
+                1,
+                first_name="Ahmed",
+                last_name="Hassan",
+                phone_number="+20 100 123 4567",
+            )
+        )
+        Patient.objects.create(
+            **patient_data(
+                2,
+                first_name="Mona",
+                last_name="Ahmed",
+                national_id_number="29801011234567",
+            )
+        )
+        Patient.objects.create(**patient_data(3, first_name="Omar", last_name="Ali"))
+        admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def search(self, query):
+        response = self.client.get(reverse("accounts:search_patients"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [row["user_name"] for row in response.data]
+
+    def test_name_prefix_search(self):
+        self.assertEqual(sorted(self.search("ahm")), ["patient1", "patient2"])
+        self.assertEqual(self.search("ahmed hass"), ["patient1"])
+        self.assertEqual(self.search("nobody"), [])
+
+    def test_phone_and_national_id_prefix_search(self):
+        self.assertEqual(self.search("+20 100 12"), ["patient1"])
+        self.assertEqual(self.search("2980101"), ["patient2"])
+
+    def test_index_follows_updates_and_deletes(self):
+        patient = Patient.objects.get(user_name="patient3")
+        patient.first_name = "Youssef"
+        patient.save()
+
+        self.assertEqual(self.search("yous"), ["patient3"])
+        self.assertEqual(self.search("omar"), [])
+
+        patient.delete()
+        self.assertEqual(self.search("yous"), [])
+
+    def test_search_is_for_staff_only(self):
+        response = APIClient().get(reverse("accounts:search_patients"), {"q": "ahmed"})
+        self.assertEqual(response.status_code, 401)
+
+    @skipUnless(connection.vendor == "sqlite", "the search triggers are sqlite only")
+    def test_triggers_dropped_by_a_table_rebuild_are_restored(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER accounts_patient_search_insert")
+            cursor.execute("DROP TRIGGER accounts_patient_search_update")
+        Patient.objects.create(**patient_data(4, first_name="Karim"))
+        self.assertEqual(self.search("karim"), [])
+
+        self.assertEqual(
+            ensure_search_triggers(),
+            ["accounts_patient_search_insert", "accounts_patient_search_update"],
+        )
+        self.assertEqual(ensure_search_triggers(), [])
+        self.assertEqual(self.search("karim"), ["patient4"])
+        Patient.objects.create(**patient_data(5, first_name="Karima"))
+        self.assertEqual(sorted(self.search("karim")), ["patient4", "patient5"])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AdminChangelistTests(TestCase):
+    """this class will check that the admin changelists cost the same number of queries"""
+
+    def setUp(self):
+        self.specialization = Specialization.objects.create(name="Cardiology")
+        admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(admin)
+        self.created = 0
+
+    def add_accounts(self, count):
+        for number in range(self.created, self.created + count):
+            patient = Patient.objects.create(**patient_data(number))
+            doctor = Doctor.objects.create(**doctor_data(number, self.specialization))
+            pharmacist = Pharmacist.objects.create(**pharmacist_data(number))
+            DoctorProfile.objects.get_or_create(doctor_name=doctor)
+            PharmacistProfile.objects.get_or_create(pharmacist_name=pharmacist)
+        self.created += count
+
+    def test_approval_in_the_change_form_creates_the_profile(self):
+        doctor = Doctor.objects.create(
+            **doctor_data(1, self.specialization, active=False)
+        )
+        url = reverse("admin:accounts_doctor_change", args=[doctor.pk])
+        data = dict(
+            doctor_data(1, self.specialization),
+            password=doctor.password,
+            password_confirmation=doctor.password,
+            specialization=self.specialization.pk,
+            slug=doctor.slug,
+            active="on",
+        )
+
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(DoctorProfile.objects.filter(doctor_name=doctor).exists())
+
+    def changelist_queries(self, model, params=None):
+        url = reverse(f"admin:accounts_{model._meta.model_name}_changelist")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_the_rows(self):
+        models = [
+            Patient,
+            Doctor,
+            Pharmacist,
+            PatientProfile,
+            DoctorProfile,
+            PharmacistProfile,
+        ]
+
+        self.add_accounts(2)
+        few = [self.changelist_queries(model) for model in models]
+        self.add_accounts(10)
+        many = [self.changelist_queries(model) for model in models]
+
+        self.assertEqual(few, many)
+
+    def test_patient_search_uses_the_search_index(self):
+        self.add_accounts(3)
+        url = reverse("admin:accounts_patient_changelist")
+
+        response = self.client.get(url, {"q": "patient1"})
+        self.assertEqual(
+            list(response.context["cl"].result_list),
+            [Patient.objects.get(user_name="patient1")],
+        )
+
+    def test_email_search_ignores_the_case(self):
+        self.add_accounts(2)
+
+        for model, email in (
+            (Patient, "Patient1@Example.com"),
+            (Doctor, " PATIENT1@example.com"),
+            (Pharmacist, "patient1@EXAMPLE.com"),
+            (DoctorProfile, "Patient1@Example.com"),
+        ):
+            url = reverse(f"admin:accounts_{model._meta.model_name}_changelist")
+            response = self.client.get(url, {"q": email})
+            self.assertEqual(len(response.context["cl"].result_list), 1, model)
+
+        url = reverse("admin:accounts_doctor_changelist")
+        response = self.client.get(url, {"q": "M1"})
+        self.assertEqual(len(response.context["cl"].result_list), 1)
+
+    @skipUnless(connection.vendor == "sqlite", "the estimate differs per database")
+    def test_unfiltered_count_is_estimated(self):
+        first = Patient.objects.create(**patient_data(1))
+        Patient.objects.create(**patient_data(2, id=5000))
+
+        paginator = EstimatedCountPaginator(Patient.objects.all(), 50)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 5000 - first.pk + 1)
+
+        paginator = EstimatedCountPaginator(Patient.objects.filter(gender="Male"), 50)
+        self.assertEqual(paginator.count, 2)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class MetricsTests(TestCase):
+    """this class will test the metrics of the requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        registry.reset()
+
+    def metrics(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_requests_are_recorded_by_route(self):
+        self.client.post(reverse("accounts:signup"), patient_data(1), format="json")
+        self.client.post(reverse("accounts:signup"), patient_data(1), format="json")
+
+        metrics = self.metrics()
+        labels = 'method="POST",route="accounts:signup"'
+        self.assertIn(f'http_requests_total{{{labels},status="201"}} 1', metrics)
+        self.assertIn(f'http_requests_total{{{labels},status="400"}} 1', metrics)
+        self.assertIn(f"http_request_duration_seconds_count{{{labels}}} 2", metrics)
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', metrics
+        )
+        self.assertIn(f"http_response_size_bytes_count{{{labels}}} 2", metrics)
+        self.assertIn(f"http_request_db_seconds_total{{{labels}}}", metrics)
+
+    def test_database_queries_are_counted(self):
+        # the SAVEPOINT, the patient and the RELEASE of the signup
+        self.client.post(reverse("accounts:signup"), patient_data(1), format="json")
+
+        labels = 'method="POST",route="accounts:signup"'
+        self.assertIn(f"http_request_db_queries_sum{{{labels}}} 3", self.metrics())
+
+    def test_unknown_urls_share_one_route(self):
+        self.client.get("/missing/1/")
+        self.client.get("/missing/2/")
+
+        self.assertIn(
+            'http_requests_total{method="GET",route="unmatched",status="404"} 2',
+            self.metrics(),
+        )
+
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic("BREW", "/missing/1/")
+        self.client.generic("PROPFIND123", "/missing/2/")
+
+        metrics = self.metrics()
+        self.assertIn(
+            'http_requests_total{method="other",route="unmatched",status="404"} 2',
+            metrics,
+        )
+        self.assertNotIn("BREW", metrics)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    ACCOUNTS_LOGIN_IP_RATE="",
+    ACCOUNTS_LOGIN_EMAIL_RATE="",
+)
+class LoadTestTests(LiveServerTestCase):
+    """this class will test the seeding, the runner and the baseline of the load test"""
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_regressions_against_the_baseline(self):
+        baseline = {"signup": {"p95_ms": 100.0, "throughput_rps": 50.0}}
+
+        def result(p95, rps, errors=0):
+            return {"signup": {"p95_ms": p95, "throughput_rps": rps, "errors": errors}}
+
+        self.assertEqual(compare(result(115.0, 45.0), baseline, 20), [])
+        self.assertEqual(len(compare(result(130.0, 50.0), baseline, 20)), 1)
+        self.assertEqual(len(compare(result(100.0, 30.0), baseline, 20)), 1)
+        self.assertEqual(len(compare(result(100.0, 50.0, errors=1), baseline, 20)), 1)
+        self.assertEqual(compare(result(500.0, 1.0), {}, 20), [])
+
+    def test_seeded_accounts_can_log_in(self):
+        real = Patient.objects.create(**patient_data(1, user_name="load-patient-real"))
+        call_command(
+            "seed_accounts", patients=3, doctors=2, pharmacists=2, stdout=io.StringIO()
+        )
+        with self.assertRaises(CommandError):
+            call_command("seed_accounts", patients=3, stdout=io.StringIO())
+        call_command(
+            "seed_accounts",
+            patients=3,
+            doctors=2,
+            pharmacists=2,
+            replace=True,
+            stdout=io.StringIO(),
+        )
+
+        # the real account that shares the prefix of the seeded ones is kept
+        self.assertTrue(Patient.objects.filter(pk=real.pk).exists())
+        self.assertEqual(Patient.objects.count(), 4)
+        self.assertEqual(Doctor.objects.count(), 2)
+        self.assertTrue(Pharmacist.objects.filter(active=True).exists())
+
+        client = Client(self.live_server_url + "/accounts/")
+        status, _ = client.send(
+            "POST",
+            "doctor/login/",
+            {"email": "load-doctor-1@loadtest.invalid", "password": SEED_PASSWORD},
+        )
+        self.assertEqual(status, 200)
+
+    def test_loadtest_reports_every_scenario(self):
+        call_command(
+            "seed_accounts", patients=3, doctors=2, pharmacists=2, stdout=io.StringIO()
+        )
+        scenarios = [
+            "signup",
+            "patient_login",
+            "patient_profile_list",
+            "patient_profile_retrieve",
+            "patient_profile_update",
+            "specialization_list",
+            "specialization_retrieve",
+        ]
+        output = io.StringIO()
+        baseline = os.path.join(self.baseline_dir(), "baseline.json")
+
+        call_command(
+            "loadtest",
+            base_url=self.live_server_url + "/accounts/",
+            requests=3,
+            concurrency=1,
+            scenarios=",".join(scenarios),
+            baseline=baseline,
+            save_baseline=True,
+            stdout=output,
+        )
+
+        with open(baseline) as baseline_file:
+            results = json.load(baseline_file)
+        self.assertEqual(sorted(results), sorted(scenarios))
+        for name, result in results.items():
+            self.assertEqual(result["errors"], 0, name)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        self.assertIn("patient_profile_update", output.getvalue())
+
+        # the accounts of the signup scenario are cleaned up with the seeded ones
+        self.assertEqual(seeded(Patient).count(), 6)
+        call_command("seed_accounts", patients=3, replace=True, stdout=io.StringIO())
+        self.assertEqual(Patient.objects.count(), 3)
+
+    def baseline_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return directory
+
+
+class SQLiteWALBackendTests(SimpleTestCase):
+    """this class will test the pragmas and the retries of the project.sqlite backend"""
+
+    def wal_connection(self, **options):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "db.sqlite3")
+        settings_dict = connections.configure_settings(
+            {"default": {"ENGINE": "project.sqlite", "NAME": path, "OPTIONS": options}}
+        )["default"]
+
+        wrapper = load_backend("project.sqlite").DatabaseWrapper(settings_dict, "wal")
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS item (name TEXT)")
+        return wrapper, path
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        wrapper, _ = self.wal_connection(pragmas={"cache_size": -4000})
+
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(wrapper, "synchronous"), 1)
+        self.assertEqual(self.pragma(wrapper, "busy_timeout"), 5000)
+        self.assertEqual(self.pragma(wrapper, "cache_size"), -4000)
+        self.assertEqual(self.pragma(wrapper, "foreign_keys"), 1)
+
+    def test_locked_statements_are_retried_outside_transactions(self):
+        wrapper, path = self.wal_connection(
+            pragmas={"busy_timeout": 0}, lock_retries=10
+        )
+        other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.1, other.execute, ["COMMIT"]).start()
+
+        with wrapper.cursor() as cursor:
+            cursor.execute("INSERT INTO item (name) VALUES (%s)", ["first"])
+            cursor.execute("SELECT count(*) FROM item")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_locked_statements_fail_without_retries(self):
+        wrapper, path = self.wal_connection(pragmas={"busy_timeout": 0}, lock_retries=0)
+        other = sqlite3.connect(path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+
+        with self.assertRaisesMessage(OperationalError, "locked"):
+            with wrapper.cursor() as cursor:
+                cursor.execute("INSERT INTO item (name) VALUES (%s)", ["first"])
+        other.execute("ROLLBACK")
+
+    def test_transactions_begin_immediate(self):
+        wrapper, path = self.wal_connection(pragmas={"busy_timeout": 0}, lock_retries=0)
+        other = sqlite3.connect(path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+
+        # atomic() starts the transactions of sqlite this way
+        wrapper.ensure_connection()
+        wrapper._start_transaction_under_autocommit()
+        self.addCleanup(wrapper.connection.rollback)
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM item")
+
+        # the read of the transaction already holds the write lock
+        with self.assertRaisesMessage(sqlite3.OperationalError, "locked"):
+            other.execute("INSERT INTO item (name) VALUES ('other')")
+
+    def test_options_of_the_sqlite_backend_are_kept(self):
+        wrapper, _ = self.wal_connection(
+            transaction_mode="DEFERRED", init_command="PRAGMA cache_size = -2000"
+        )
+
+        self.assertEqual(wrapper.transaction_mode, "DEFERRED")
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(wrapper, "cache_size"), -2000)
+
+
+class ConnectionBenchmarkTests(TestCase):
+    """this class will test the benchmark of the connection modes"""
+
+    def test_every_mode_is_reported(self):
+        output = io.StringIO()
+        call_command("bench_connections", requests=5, threads=2, stdout=output)
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(
+            [line.split()[0] for line in lines[1:]], ["connect", "persistent", "pool"]
+        )
+        self.assertIn("skipped", lines[-1])
+
+
+# the default database stands in for a replica, a read the router sends to
+# the replica is seen as "default" and a read left to the default database as None
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ACCOUNTS_READ_REPLICAS=["default"])
+class ReplicaRoutingTests(TestCase):
+    """this class will test the routing of the profile reads to the replicas"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.patient = Patient.objects.create(**patient_data(1))
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {issue_tokens(self.patient)['access']}"
+        )
+        self.detail_url = reverse(
+            "accounts:update_patient_profile-detail", args=[self.patient.pk]
+        )
+
+    def routed_reads(self, method, url, *args, **kwargs):
+        reads = []
+        self.read_models = []
+        original = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = original(router, model, **hints)
+            reads.append(alias)
+            self.read_models.append((model._meta.label_lower, alias))
+            return alias
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            response = getattr(self.client, method)(url, *args, **kwargs)
+        return response, reads
+
+    def test_profile_reads_go_to_the_replicas(self):
+        response, reads = self.routed_reads(
+            "get", reverse("accounts:update_patient_profile-list")
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(reads), {"default"})
+
+        response, reads = self.routed_reads("get", self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(reads), {"default"})
+
+    def test_reads_stick_to_the_default_database_after_a_write(self):
+        response, reads = self.routed_reads(
+            "patch", self.detail_url, {"address": "new address"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(reads), {None})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        response, reads = self.routed_reads("get", self.detail_url)
+        self.assertEqual(response.data["address"], "new address")
+        self.assertEqual(set(reads), {None})
+
+        # API clients ignore the cookies, their token keeps them pinned
+        self.client.cookies.clear()
+        response, reads = self.routed_reads("get", self.detail_url)
+        self.assertEqual(set(reads), {None})
+
+        other = APIClient()
+        reader = Patient.objects.create(**patient_data(2))
+        other.credentials(HTTP_AUTHORIZATION=f"Bearer {issue_tokens(reader)['access']}")
+        self.client = other
+        response, reads = self.routed_reads("get", self.detail_url)
+        self.assertEqual(set(reads), {"default"})
+
+    def test_one_replica_serves_the_reads_of_a_request(self):
+        state = RoutingState()
+        state.replica = True
+        token = routing_state.set(state)
+        self.addCleanup(routing_state.reset, token)
+
+        router = ReplicaRouter()
+        with mock.patch(
+            "accounts.routers.read_replicas",
+            return_value=[f"replica{n}" for n in range(9)],
+        ):
+            aliases = {router.db_for_read(Patient) for _ in range(20)}
+        self.assertEqual(len(aliases), 1)
+
+    def test_only_the_account_models_go_to_the_replicas(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client = APIClient()
+        self.client.force_login(admin)
+
+        response, reads = self.routed_reads(
+            "get", reverse("accounts:update_patient_profile-list")
+        )
+
+        self.assertEqual(response.status_code, 200)
+        routed = dict(self.read_models)
+        self.assertEqual(routed["accounts.patient"], "default")
+        self.assertIsNone(routed["sessions.session"])
+        self.assertIsNone(routed["auth.user"])
+
+    def test_pin_check_leaves_the_user_lazy(self):
+        request = RequestFactory().get(
+            "/", HTTP_COOKIE=f"{settings.SESSION_COOKIE_NAME}=session-key"
+        )
+        request.user = SimpleLazyObject(lambda: self.fail("the user was loaded"))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(is_pinned(request))
+            cache.set(pin_key(request), 1)
+            self.assertTrue(is_pinned(request))
+
+    def test_other_views_read_the_default_database(self):
+        Specialization.objects.create(name="Cardiology")
+        response, reads = self.routed_reads(
+            "get", reverse("accounts:specialization-list")
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(reads), {None})
+
+    @override_settings(ACCOUNTS_READ_REPLICAS=[])
+    def test_without_replicas_nothing_is_routed(self):
+        response, reads = self.routed_reads(
+            "patch", self.detail_url, {"address": "new address"}, format="json"
+        )
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        response, reads = self.routed_reads("get", self.detail_url)
+        self.assertEqual(set(reads), {None})
+
+    def test_replicas_are_not_migrated(self):
+        with self.settings(ACCOUNTS_READ_REPLICAS=["replica1"]):
+            self.assertIs(ReplicaRouter().allow_migrate("replica1", "accounts"), False)
+            self.assertIsNone(ReplicaRouter().allow_migrate("default", "accounts"))
+
+    def test_sqlite_replica_copy(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, "default.sqlite3")
+        target = os.path.join(directory, "replica.sqlite3")
+
+        with sqlite3.connect(source) as database:
+            database.execute("CREATE TABLE item (name TEXT)")
+            database.execute("INSERT INTO item VALUES ('first')")
+        copy_database(source, target)
+
+        replica = sqlite3.connect(target)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute("SELECT name FROM item").fetchall(), [("first",)]
+        )
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    ACCOUNTS_LOGIN_IP_RATE="4/min",
+    ACCOUNTS_LOGIN_EMAIL_RATE="2/min",
+)
+class LoginThrottleTests(TestCase):
+    """this class will test the token buckets of the login endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        registry.reset()
+        self.client = APIClient()
+        Patient.objects.create(**patient_data(1))
+
+    def login(self, email="patient1@example.com", url="accounts:login"):
+        return self.client.post(
+            reverse(url), {"email": email, "password": "wrong-password"}, format="json"
+        )
+
+    def test_rate_parsing(self):
+        self.assertEqual(parse_rate("10/min"), (10, 10 / 60))
+        self.assertEqual(parse_rate("2/s"), (2, 2.0))
+        self.assertIsNone(parse_rate(""))
+        self.assertIsNone(parse_rate(None))
+        for rate in ("10", "ten/min", "0/min", "10/fortnight", "10/"):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_rate(rate)
+
+    @override_settings(ACCOUNTS_LOGIN_EMAIL_RATE="10 per minute")
+    def test_malformed_rates_fail_the_system_checks(self):
+        [error] = check_login_rates(None)
+        self.assertEqual(error.id, "accounts.E001")
+        self.assertEqual(error.obj, "ACCOUNTS_LOGIN_EMAIL_RATE")
+        with self.assertRaises(ImproperlyConfigured):
+            LOGIN_THROTTLES[1]()
+
+    def test_email_bucket_is_checked_before_the_password(self):
+        self.assertEqual(self.login().status_code, 400)
+        self.assertEqual(self.login(" PATIENT1@example.com").status_code, 400)
+
+        with mock.patch("accounts.views.verify_password") as verify:
+            response = self.login()
+        verify.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+        # another email still has its own bucket
+        self.assertEqual(self.login("patient2@example.com").status_code, 400)
+
+    def test_ip_bucket_covers_every_email(self):
+        for number in range(4):
+            self.assertEqual(self.login(f"user{number}@example.com").status_code, 400)
+
+        self.assertEqual(self.login("user9@example.com").status_code, 429)
+        response = self.client.post(
+            reverse("accounts:login"),
+            {"email": "user9@example.com", "password": "wrong-password"},
+            format="json",
+            REMOTE_ADDR="10.0.0.2",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_buckets_refill_over_time(self):
+        with mock.patch("accounts.throttling.time.time", return_value=1000.0):
+            self.login()
+            self.login()
+            self.assertEqual(self.login().status_code, 429)
+
+        with mock.patch("accounts.throttling.time.time", return_value=1030.0):
+            self.assertEqual(self.login().status_code, 400)
+            self.assertEqual(self.login().status_code, 429)
+
+    def test_doctor_and_pharmacist_logins_are_throttled(self):
+        for url in ("accounts:doctor_login", "accounts:pharmacist_login"):
+            cache.clear()
+            self.login("staff@example.com", url)
+            self.login("staff@example.com", url)
+            self.assertEqual(self.login("staff@example.com", url).status_code, 429)
+
+    def test_signups_are_not_throttled(self):
+        url = reverse("accounts:Pharmacist_signup-list")
+        for number in range(6):
+            response = self.client.post(url, pharmacist_data(number + 2), format="json")
+            self.assertEqual(response.status_code, 201)
+
+    def test_rejected_attempts_are_counted(self):
+        for _ in range(3):
+            self.login()
+
+        self.assertIn('login_throttled_total{scope="login_email"} 1', registry.render())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class BulkApprovalTests(TestCase):
+    """this class will test the bulk approval of the doctors and pharmacists"""
+
+    def setUp(self):
+        self.specialization = Specialization.objects.create(name="Cardiology")
+        self.admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.created = 0
+
+    def add_doctors(self, count):
+        doctors = [
+            Doctor.objects.create(**doctor_data(number, self.specialization))
+            for number in range(self.created, self.created + count)
+        ]
+        self.created += count
+        return [doctor.pk for doctor in doctors]
+
+    def approve(self, ids, kind="doctors"):
+        return self.client.post(
+            reverse("accounts:approve_staff", args=[kind]), {"ids": ids}, format="json"
+        )
+
+    def test_approval_queries_do_not_grow_with_the_rows(self):
+        # SAVEPOINT, UPDATE, SELECT of the missing profiles, INSERT,
+        # COUNT of the profiles still missing, RELEASE
+        for count in (2, 20):
+            ids = self.add_doctors(count)
+            with self.assertNumQueries(6):
+                response = self.approve(ids)
+            self.assertEqual(
+                response.data, {"updated": count, "profiles_created": count}
+            )
+
+        self.assertEqual(Doctor.objects.filter(active=True).count(), 22)
+        self.assertEqual(DoctorProfile.objects.count(), 22)
+
+    def test_approval_is_idempotent(self):
+        ids = self.add_doctors(3)
+        self.approve(ids)
+
+        # SAVEPOINT, UPDATE, SELECT of the missing profiles, RELEASE
+        with self.assertNumQueries(4):
+            response = self.approve(ids)
+        self.assertEqual(response.data, {"updated": 0, "profiles_created": 0})
+        self.assertEqual(DoctorProfile.objects.count(), 3)
+
+    def test_profiles_missing_for_active_accounts_are_created(self):
+        pharmacist = Pharmacist.objects.create(**pharmacist_data(1, active=True))
+        PharmacistProfile.objects.all().delete()
+
+        response = self.approve([pharmacist.pk], kind="pharmacists")
+        self.assertEqual(response.data, {"updated": 0, "profiles_created": 1})
+        self.assertEqual(PharmacistProfile.objects.get().slug, pharmacist.slug)
+
+    def test_deactivate_keeps_the_profiles(self):
+        ids = self.add_doctors(2)
+        self.approve(ids)
+
+        response = self.client.post(
+            reverse("accounts:deactivate_staff", args=["doctors"]),
+            {"ids": ids},
+            format="json",
+        )
+        self.assertEqual(response.data, {"updated": 2, "profiles_created": 0})
+        self.assertFalse(Doctor.objects.filter(active=True).exists())
+        self.assertEqual(DoctorProfile.objects.count(), 2)
+
+    def test_active_accounts_can_be_saved_again(self):
+        doctor = Doctor.objects.create(
+            **doctor_data(1, self.specialization, active=True)
+        )
+        doctor.address = "new address"
+        doctor.save()
+
+        self.assertEqual(DoctorProfile.objects.filter(doctor_name=doctor).count(), 1)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.approve([1], kind="patients").status_code, 404)
+        self.assertEqual(self.approve("1,2").status_code, 400)
+        self.assertEqual(self.approve([]).status_code, 400)
+        self.assertEqual(self.approve([True]).status_code, 400)
+        self.assertEqual(self.approve(list(range(1001))).status_code, 400)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.approve([1]).status_code, 401)
+
+    def test_admin_actions(self):
+        ids = self.add_doctors(3)
+        self.client.force_login(self.admin)
+        url = reverse("admin:accounts_doctor_changelist")
+
+        response = self.client.post(
+            url, {"action": "approve", "_selected_action": ids[:2]}, follow=True
+        )
+        self.assertContains(response, "2 accounts approved, 2 profiles created")
+        self.assertEqual(Doctor.objects.filter(active=True).count(), 2)
+
+        self.client.post(url, {"action": "deactivate", "_selected_action": ids})
+        self.assertFalse(Doctor.objects.filter(active=True).exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class PendingApprovalTests(TestCase):
+    """this class will test the queue of the accounts waiting for approval"""
+
+    def setUp(self):
+        self.specialization = Specialization.objects.create(name="Cardiology")
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+
+    def test_pages_walk_the_pending_accounts_oldest_first(self):
+        doctors = [
+            Doctor.objects.create(
+                **doctor_data(number, self.specialization, active=number % 2 == 0)
+            )
+            for number in range(7)
+        ]
+
+        ids = []
+        url = reverse("accounts:pending_staff", args=["doctors"])
+        params = {"page_size": 2}
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            ids += [row["id"] for row in response.data["results"]]
+            url, params = response.data["next"], None
+
+        self.assertEqual(ids, [doctor.pk for doctor in doctors if not doctor.active])
+
+    def test_pending_pharmacists_have_what_the_approval_needs(self):
+        pharmacist = Pharmacist.objects.create(**pharmacist_data(1))
+        Pharmacist.objects.create(**pharmacist_data(2, active=True))
+
+        response = self.client.get(
+            reverse("accounts:pending_staff", args=["pharmacists"])
+        )
+        [row] = response.data["results"]
+        self.assertEqual(row["id"], pharmacist.pk)
+        self.assertEqual(row["email"], "patient1@example.com")
+        self.assertNotIn("password", row)
+
+        self.client.post(
+            reverse("accounts:approve_staff", args=["pharmacists"]),
+            {"ids": [row["id"]]},
+            format="json",
+        )
+        response = self.client.get(
+            reverse("accounts:pending_staff", args=["pharmacists"])
+        )
+        self.assertEqual(response.data["results"], [])
+
+    def test_unknown_kinds_and_non_staff_are_rejected(self):
+        response = self.client.get(reverse("accounts:pending_staff", args=["patients"]))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.force_authenticate(User.objects.create_user("user"))
+        response = self.client.get(reverse("accounts:pending_staff", args=["doctors"]))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LazyProfileTests(TestCase):
+    """this class will test that the profiles are created in batches, not on save"""
+
+    def setUp(self):
+        self.specialization = Specialization.objects.create(name="Cardiology")
+
+    def test_signup_writes_no_profile(self):
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().post(
+                reverse("accounts:signup"), patient_data(1), format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+
+        inserts = [q for q in context.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertNotIn("accounts_patientprofile", " ".join(q["sql"] for q in inserts))
+        self.assertFalse(PatientProfile.objects.exists())
+
+    def test_materialize_counts_the_inserted_profiles_only(self):
+        first, second = [
+            Patient.objects.create(**patient_data(number)) for number in (1, 2)
+        ]
+        # the profile of another patient already holds the slug of the second one
+        PatientProfile.objects.create(Patient_name=first, slug=second.slug)
+
+        self.assertEqual(materialize_profiles(Patient.objects.all()), 0)
+        self.assertFalse(PatientProfile.objects.filter(Patient_name=second).exists())
+
+        PatientProfile.objects.update(slug=first.slug)
+        with self.assertNumQueries(3):
+            self.assertEqual(materialize_profiles(Patient.objects.all()), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(materialize_profiles(Patient.objects.all()), 0)
+
+    def test_staff_saves_cost_no_profile_queries(self):
+        doctor = Doctor.objects.create(**doctor_data(1, self.specialization))
+        self.assertFalse(DoctorProfile.objects.exists())
+
+        doctor.active = True
+        with self.assertNumQueries(1):
+            doctor.save()
+        self.assertFalse(DoctorProfile.objects.exists())
+
+        pharmacist = Pharmacist.objects.create(**pharmacist_data(1, active=True))
+        with self.assertNumQueries(1):
+            pharmacist.save()
+        self.assertEqual(PharmacistProfile.objects.get().pharmacist_name, pharmacist)
+
+    def test_command_materializes_the_missing_profiles(self):
+        for number in range(5):
+            Patient.objects.create(**patient_data(number))
+        materialize_profiles(Patient.objects.filter(pk=Patient.objects.first().pk))
+        Doctor.objects.create(**doctor_data(1, self.specialization))
+        Doctor.objects.create(**doctor_data(2, self.specialization, active=True))
+        DoctorProfile.objects.all().delete()
+
+        output = io.StringIO()
+        call_command("materialize_profiles", batch_size=2, stdout=output)
+        self.assertIn("4 patients profiles created", output.getvalue())
+        self.assertIn("1 doctors profiles created", output.getvalue())
+        self.assertEqual(PatientProfile.objects.count(), 5)
+        self.assertEqual(DoctorProfile.objects.get().doctor_name.active, True)
+
+        output = io.StringIO()
+        call_command("materialize_profiles", kind=["patients"], stdout=output)
+        self.assertEqual(output.getvalue(), "0 patients profiles created\n")
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ACCOUNTS_TASK_BACKEND="database")
+class BackgroundTaskTests(TestCase):
+    """this class will test the background tasks of the signups"""
+
+    def signup(self):
+        response = APIClient().post(
+            reverse("accounts:signup"), patient_data(1), format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        return Patient.objects.get()
+
+    def test_signup_work_runs_in_the_worker(self):
+        patient = self.signup()
+        task = Task.objects.get()
+        self.assertEqual(
+            (task.name, task.args), ("after_signup", ["accounts.patient", patient.pk])
+        )
+        self.assertEqual(mail.outbox, [])
+
+        output = io.StringIO()
+        with self.assertLogs("accounts.audit") as logs:
+            call_command("run_tasks", once=True, stdout=output)
+
+        # the profile comes from the batch queued by the task
+        self.assertEqual(output.getvalue(), "2 tasks run\n")
+        self.assertFalse(Task.objects.exists())
+        self.assertTrue(PatientProfile.objects.filter(Patient_name=patient).exists())
+        self.assertEqual(mail.outbox[0].to, [patient.email])
+        self.assertIn(f"signup patient {patient.pk}", logs.output[0])
+
+    def test_profile_batch_is_queued_once(self):
+        client = APIClient()
+        for number in range(3):
+            client.post(reverse("accounts:signup"), patient_data(number), format="json")
+
+        with self.assertLogs("accounts.audit"):
+            self.assertEqual(run_pending(), 3)
+        self.assertEqual(
+            list(Task.objects.values_list("name", flat=True)),
+            ["materialize_missing_profiles"],
+        )
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(PatientProfile.objects.count(), 3)
+
+    def test_failed_tasks_are_retried_then_kept(self):
+        def broken():
+            raise RuntimeError("smtp is down")
+
+        with mock.patch.dict(TASKS, {"broken": broken}):
+            enqueue("broken")
+            with self.assertLogs("accounts.tasks", "ERROR"):
+                self.assertEqual(run_pending(), 1)
+
+            task = Task.objects.get()
+            self.assertEqual((task.status, task.attempts), ("pending", 1))
+            self.assertIn("smtp is down", task.last_error)
+            self.assertGreater(task.run_after, task.created_at)
+            self.assertEqual(run_pending(), 0)
+
+            Task.objects.update(run_after=task.created_at)
+            with self.settings(ACCOUNTS_TASK_MAX_ATTEMPTS=2):
+                with self.assertLogs("accounts.tasks", "ERROR"):
+                    run_pending()
+            self.assertEqual(Task.objects.get().status, "failed")
+            self.assertEqual(run_pending(), 0)
+
+    def test_tasks_of_stopped_workers_are_run_again(self):
+        patient = self.signup()
+        Task.objects.update(
+            status="running",
+            attempts=1,
+            locked_at=patient.created_at - timedelta(hours=1),
+        )
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(
+            list(Task.objects.values_list("name", "status")),
+            [("materialize_missing_profiles", "pending")],
+        )
+
+    @override_settings(ACCOUNTS_TASK_BACKEND="immediate")
+    def test_immediate_backend_runs_after_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            patient = self.signup()
+
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(mail.outbox[0].to, [patient.email])
+
+    @override_settings(ACCOUNTS_TASK_BACKEND="thread")
+    def test_thread_backend_runs_in_the_background(self):
+        done = threading.Event()
+
+        with mock.patch.dict(TASKS, {"notify": lambda: done.set()}):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue("notify")
+            self.assertTrue(done.wait(5))
+        self.assertFalse(Task.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command("run_tasks", once=True)
@@ -0,0 +1,157 @@
+"""
+in this module we will throttle the login attempts with token buckets per client ip
+and per email, the throttles of a view run before the view looks the account up
+and hashes the password, so a storm of attempts costs a cache lookup each
+instead of a password hash, the buckets live in the cache of ACCOUNTS_THROTTLE_CACHE,
+a malformed rate is reported by the accounts.E001 system check at startup
+
+"""
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import registry
+from .models import normalize_email
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    this function will parse a rate like "10/min" into the capacity of the bucket
+    and the tokens it gets back per second, or None when the rate is empty,
+    a malformed rate raises ImproperlyConfigured
+
+    """
+
+    if not rate:
+        return None
+    count, _, period = str(rate).partition("/")
+    if not count.isdigit() or int(count) < 1 or period[:1] not in PERIODS:
+        raise ImproperlyConfigured(
+            f'invalid throttle rate {rate!r}, expected "count/period" '
+            "with a count above 0 and a period of s, min, hour or day"
+        )
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    this class will let a burst of `capacity` requests through per key,
+    then one request each time the bucket refills a token, the read and the
+    write of a bucket are one step for the threads of a process only, so with
+    a shared cache the processes racing on a bucket can each take its last
+    token and the limit is exact per process, not across the processes
+
+    """
+
+    scope = None
+    rate_setting = None
+    default_rate = None
+
+    # the read and the write of a bucket are one step for the threads of a process
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.rate = parse_rate(self.get_rate())
+        self.tokens_needed_in = 0
+
+    def get_rate(self):
+        return getattr(settings, self.rate_setting, self.default_rate)
+
+    def get_cache(self):
+        return caches[getattr(settings, "ACCOUNTS_THROTTLE_CACHE", "default")]
+
+    def get_key(self, request, view):
+        """this function will return the identity of the bucket, or None to skip it"""
+
+        raise NotImplementedError(".get_key() must be overridden")
+
+    def allow_request(self, request, view):
+        key = self.get_key(request, view)
+        if self.rate is None or key is None:
+            return True
+
+        capacity, refill = self.rate
+        cache = self.get_cache()
+        cache_key = f"throttle:{self.scope}:{key}"
+        now = time.time()
+
+        with self.lock:
+            tokens, updated = cache.get(cache_key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            cache.set(cache_key, (tokens, now), timeout=int(capacity / refill) + 1)
+
+        if not allowed:
+            self.tokens_needed_in = (1 - tokens) / refill
+            registry.inc(
+                "login_throttled_total",
+                {"scope": self.scope},
+                description="Login attempts rejected by the throttles.",
+            )
+        return allowed
+
+    def wait(self):
+        return self.tokens_needed_in
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    """this class will throttle the login attempts of a client ip"""
+
+    scope = "login_ip"
+    rate_setting = "ACCOUNTS_LOGIN_IP_RATE"
+    default_rate = "30/min"
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginEmailThrottle(TokenBucketThrottle):
+    """this class will throttle the login attempts on an email from every ip"""
+
+    scope = "login_email"
+    rate_setting = "ACCOUNTS_LOGIN_EMAIL_RATE"
+    default_rate = "10/min"
+
+    def get_key(self, request, view):
+        email = request.data.get("email")
+        if not isinstance(email, str) or not email:
+            return None
+        return hashlib.sha256(normalize_email(email).encode()).hexdigest()
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginEmailThrottle]
+
+
+class LoginThrottlesMixin:
+    """this class will throttle the login action of a viewset with LOGIN_THROTTLES"""
+
+    def get_throttles(self):
+        if self.action == "login":
+            return [throttle() for throttle in LOGIN_THROTTLES]
+        return super().get_throttles()
+
+
+def check_login_rates(app_configs, **kwargs):
+    """this function will report the malformed rates of the login throttles"""
+
+    errors = []
+    for throttle in LOGIN_THROTTLES:
+        try:
+            throttle()
+        except ImproperlyConfigured as error:
+            errors.append(
+                checks.Error(str(error), obj=throttle.rate_setting, id="accounts.E001")
+            )
+    return errors
@@ -0,0 +1,78 @@
+"""
+in this module we will issue and verify the signed tokens of the accounts,
+the tokens are signed with HMAC by django.core.signing so the access token
+can be verified without a database query
+
+"""
+
+from django.conf import settings
+from django.core import signing
+
+from .models import Doctor, Patient, Pharmacist
+
+
+ACCESS_SALT = "accounts.tokens.access"
+REFRESH_SALT = "accounts.tokens.refresh"
+
+ROLES = {
+    "patient": Patient,
+    "doctor": Doctor,
+    "pharmacist": Pharmacist,
+}
+
+
+def access_lifetime():
+    return getattr(settings, "ACCOUNTS_ACCESS_TOKEN_LIFETIME", 15 * 60)
+
+
+def refresh_lifetime():
+    return getattr(settings, "ACCOUNTS_REFRESH_TOKEN_LIFETIME", 7 * 24 * 60 * 60)
+
+
+def role_of(account):
+    """this function will return the role name of a patient, doctor or pharmacist"""
+
+    for role, model in ROLES.items():
+        if isinstance(account, model):
+            return role
+    raise ValueError(f"{type(account).__name__} has no token role")
+
+
+def issue_tokens(account):
+    """this function will return a new pair of access and refresh tokens for the account"""
+
+    payload = {"role": role_of(account), "id": account.pk}
+    return {
+        "access": signing.dumps(payload, salt=ACCESS_SALT),
+        "refresh": signing.dumps(payload, salt=REFRESH_SALT),
+        "token_type": "Bearer",
+        "expires_in": access_lifetime(),
+    }
+
+
+def load_access_token(token):
+    """
+    this function will return the payload of a valid access token,
+    it raises signing.BadSignature (or SignatureExpired) otherwise
+
+    """
+
+    return signing.loads(token, salt=ACCESS_SALT, max_age=access_lifetime())
+
+
+def load_refresh_token(token):
+    """
+    this function will return the account of a valid refresh token,
+    or None when the account was removed or deactivated since the login
+
+    """
+
+    payload = signing.loads(token, salt=REFRESH_SALT, max_age=refresh_lifetime())
+    model = ROLES.get(payload.get("role"))
+    if model is None:
+        raise signing.BadSignature("unknown role")
+
+    account = model.objects.filter(pk=payload.get("id")).first()
+    if account is None or not getattr(account, "active", True):
+        return None
+    return account
@@ -37,6 +37,35 @@ urlpatterns = [
         "signup/", views.signup, name="signup"
     ),  # this endpoint is used to create a new account
     path("", include(router.urls)),
+    path(
+        "patients/import/", views.bulk_import_patients, name="bulk_import_patients"
+    ),  # this endpoint is used to import patients in bulk from a csv or jsonl file
+    path(
+        "patients/import/<int:pk>/", views.import_job, name="import_job"
+    ),  # this endpoint is used to read the status and the report of a bulk import
+    path(
+        "patients/search/", views.search_patients_view, name="search_patients"
+    ),  # this endpoint is used to search the patients by name, phone or national id
+    path(
+        "export/<str:kind>/", views.export_accounts, name="export_accounts"
+    ),  # this endpoint is used to stream the patients, doctors or pharmacists
+    path(
+        "staff/<str:kind>/pending/",
+        views.PendingStaffView.as_view(),
+        name="pending_staff",
+    ),  # this endpoint is used to list the doctors or pharmacists waiting for approval
+    path(
+        "staff/<str:kind>/approve/",
+        views.set_staff_active,
+        {"active": True},
+        name="approve_staff",
+    ),  # this endpoint is used to approve doctors or pharmacists in bulk
+    path(
+        "staff/<str:kind>/deactivate/",
+        views.set_staff_active,
+        {"active": False},
+        name="deactivate_staff",
+    ),  # this endpoint is used to deactivate doctors or pharmacists in bulk
     path("patient/login/", views.patient_login, name="login"),
     path(
         "doctor/login/",
@@ -48,4 +77,7 @@ urlpatterns = [
         views.PharmacistViewSet.as_view({"post": "login"}),
         name="pharmacist_login",
     ),
+    path(
+        "token/refresh/", views.refresh_token, name="token_refresh"
+    ),  # this endpoint is used to get a new access token from a refresh token
 ]
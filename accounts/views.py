@@ -1,88 +1,255 @@
+import hashlib
+import json
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from .models import *
 from .serializers import *
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+    throttle_classes,
+)
 from rest_framework.response import Response
-from rest_framework import status, viewsets
-from django.contrib.auth.hashers import check_password
+from rest_framework import generics, status, viewsets
+from rest_framework.exceptions import NotFound
 from django.contrib.auth import logout
-from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from .approval import MAX_IDS as MAX_STAFF_IDS
+from .approval import STAFF, set_active
+from .bulk_import import guess_format
+from .cache import specialization_cache_key, specialization_version
+from .exporting import EXPORTS, parse_created, stream_export
+from .exporting import FORMATS as EXPORT_FORMATS
+from .hashing import verify_password
+from .pagination import PendingCursorPagination, ProfileCursorPagination
+from .readers import ValuesReader
+from .search import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT
+from .search import search_patients
+from .tasks import enqueue
+from .permissions import IsAccountOwnerOrReadOnly
+from .throttling import LOGIN_THROTTLES, LoginThrottlesMixin
+from .tokens import issue_tokens, load_refresh_token
 
 
 @api_view(["POST"])
+@authentication_classes([])
 def signup(request):
     """
     this function will create a new account
     """
 
-    data = request.data
-    user = PatientSerializer(data=data)
-
-    if user.is_valid():
-        if not Patient.objects.filter(email=data["email"]).exists():
-            user = Patient.objects.create(
-                user_name=data["user_name"],
-                first_name=data["first_name"],
-                last_name=data["last_name"],
-                email=data["email"],
-                password=data["password"],
-                password_confirmation=data["password_confirmation"],
-                national_id_number=data["national_id_number"],
-                address=data["address"],
-                phone_number=data["phone_number"],
-                blood_type=data["blood_type"],
-                gender=data["gender"],
-                age=data["age"],
-            )
+    serializer = PatientSerializer(data=request.data)
 
-            return Response(
-                "message: Account created successfully", status=status.HTTP_201_CREATED
-            )
-
-        else:
-            return Response(
-                "message: Email already exists", status=status.HTTP_400_BAD_REQUEST
-            )
+    if serializer.is_valid():
+        serializer.save()
+        return Response(
+            "message: Account created successfully", status=status.HTTP_201_CREATED
+        )
 
     else:
-        return Response(user.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def bulk_import_patients(request):
+    """
+    this function will save the uploaded csv or jsonl file as an import job and
+    queue its import in the background, the report is read from import_job
+    """
+
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response("message: file is required", status=status.HTTP_400_BAD_REQUEST)
+
+    file_format = request.data.get("file_format") or guess_format(upload.name)
+    if file_format not in ("csv", "jsonl"):
+        return Response(
+            "message: file must be csv or jsonl", status=status.HTTP_400_BAD_REQUEST
+        )
+
+    with transaction.atomic():
+        job = ImportJob.objects.create(file=upload, file_format=file_format)
+        enqueue("run_import_job", job.pk)
+    return Response(import_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+
+def import_job_data(job):
+    """this function will return the status and the report of the import job"""
+
+    return {
+        "job": job.pk,
+        "status": job.status,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "report": job.report,
+    }
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def import_job(request, pk):
+    """
+    this function will return the status of an import job and its report
+    of the created and rejected rows once it is done
+    """
+
+    job = get_object_or_404(ImportJob, pk=pk)
+    return Response(import_job_data(job), status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def set_staff_active(request, kind, active):
+    """
+    this function will approve or deactivate the doctors or pharmacists of the
+    posted ids with one UPDATE, the approved ones get their missing profiles
+    """
+
+    if kind not in STAFF:
+        return Response("message: Unknown staff", status=status.HTTP_404_NOT_FOUND)
+
+    ids = request.data.get("ids")
+    if (
+        not isinstance(ids, list)
+        or not ids
+        or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)
+    ):
+        return Response(
+            "message: ids must be a list of ids", status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(ids) > MAX_STAFF_IDS:
+        return Response(
+            f"message: at most {MAX_STAFF_IDS} ids at once",
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    model = STAFF[kind]
+    updated, profiles = set_active(model.objects.filter(pk__in=ids), active)
+    return Response(
+        {"updated": updated, "profiles_created": profiles}, status=status.HTTP_200_OK
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_accounts(request, kind):
+    """
+    this function will stream the patients, doctors or pharmacists as NDJSON or CSV,
+    ?output= picks the format and ?created_after= / ?created_before= filter the rows
+    """
+
+    if kind not in EXPORTS:
+        return Response("message: Unknown export", status=status.HTTP_404_NOT_FOUND)
+
+    file_format = request.query_params.get("output", "ndjson")
+    if file_format not in EXPORT_FORMATS:
+        return Response(
+            "message: output must be ndjson or csv", status=status.HTTP_400_BAD_REQUEST
+        )
+
+    filters = {}
+    try:
+        for bound in ("created_after", "created_before"):
+            if request.query_params.get(bound):
+                filters[bound] = parse_created(request.query_params[bound])
+    except ValueError:
+        return Response("message: Invalid date", status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        stream_export(kind, file_format, **filters),
+        content_type=EXPORT_FORMATS[file_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{kind}.{file_format}"'
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def search_patients_view(request):
+    """
+    this function will search the patients by name, phone number or national id
+    and return the best matches first
+    """
+
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        limit = DEFAULT_SEARCH_LIMIT
+
+    patients = search_patients(request.query_params.get("q", ""), max(limit, 1))
+    return Response(
+        [
+            {"id": patient.pk, **ProfilePatientSerializer(patient).data}
+            for patient in patients
+        ],
+        status=status.HTTP_200_OK,
+    )
 
 
 @api_view(["POST"])
+@authentication_classes([])
+@throttle_classes(LOGIN_THROTTLES)
 def patient_login(request):
     """
     this function will login the patient and return the patient profile
     """
 
     data = request.data
-    patient = Patient.objects.filter(email=data["email"]).first()
+    patient = Patient.objects.by_email(data["email"])
 
-    if patient is not None and check_password(data["password"], patient.password):
+    if patient is not None and verify_password(data["password"], patient.password):
         serializer = ProfilePatientSerializer(patient)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(
+            {**serializer.data, **issue_tokens(patient)}, status=status.HTTP_200_OK
+        )
     else:
         return Response(
             "message: Invalid credentials", status=status.HTTP_400_BAD_REQUEST
         )
 
 
-class DoctorViewSet(viewsets.ViewSet):
+@api_view(["POST"])
+@authentication_classes([])
+def refresh_token(request):
+    """
+    this function will return a new pair of tokens for a valid refresh token
+    """
+
+    try:
+        account = load_refresh_token(str(request.data.get("refresh", "")))
+    except signing.BadSignature:
+        account = None
+
+    if account is None:
+        return Response(
+            "message: Invalid refresh token", status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    return Response(issue_tokens(account), status=status.HTTP_200_OK)
+
+
+class DoctorViewSet(LoginThrottlesMixin, viewsets.ViewSet):
     """this class is used to create a Doctor account and check if the email already exists"""
 
+    authentication_classes = []
+
     def create(self, request):
         serializer = DoctorSerializer(data=request.data)
         if serializer.is_valid():
-            email = serializer.validated_data["email"]
-            if not Doctor.objects.filter(email=email).exists():
-                serializer.save()
-                return Response(
-                    "message: Account created successfully, Wait for approval",
-                    status=status.HTTP_201_CREATED,
-                )
-            else:
-                return Response(
-                    "message: Email already exists", status=status.HTTP_400_BAD_REQUEST
-                )
+            serializer.save()
+            return Response(
+                "message: Account created successfully, Wait for approval",
+                status=status.HTTP_201_CREATED,
+            )
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -92,38 +259,36 @@ class DoctorViewSet(viewsets.ViewSet):
         """
 
         data = request.data
-        doctor = Doctor.objects.filter(email=data["email"]).first()
+        doctor = Doctor.objects.by_email(data["email"])
 
         if (
             doctor is not None
-            and check_password(data["password"], doctor.password)
+            and verify_password(data["password"], doctor.password)
             and doctor.active
         ):
             serializer = DoctorProfileSerializer(doctor)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(
+                {**serializer.data, **issue_tokens(doctor)}, status=status.HTTP_200_OK
+            )
         else:
             return Response(
                 "message: Invalid credentials", status=status.HTTP_400_BAD_REQUEST
             )
 
 
-class PharmacistViewSet(viewsets.ViewSet):
+class PharmacistViewSet(LoginThrottlesMixin, viewsets.ViewSet):
     """this class is used to create a pharmacist account and check if the email already exists"""
 
+    authentication_classes = []
+
     def create(self, request):
         serializer = PharmacistSerializer(data=request.data)
         if serializer.is_valid():
-            email = serializer.validated_data["email"]
-            if not Pharmacist.objects.filter(email=email).exists():
-                serializer.save()
-                return Response(
-                    "message: Account created successfully, Wait for approval",
-                    status=status.HTTP_201_CREATED,
-                )
-            else:
-                return Response(
-                    "message: Email already exists", status=status.HTTP_400_BAD_REQUEST
-                )
+            serializer.save()
+            return Response(
+                "message: Account created successfully, Wait for approval",
+                status=status.HTTP_201_CREATED,
+            )
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -133,15 +298,18 @@ class PharmacistViewSet(viewsets.ViewSet):
         """
 
         data = request.data
-        pharmacist = Pharmacist.objects.filter(email=data["email"]).first()
+        pharmacist = Pharmacist.objects.by_email(data["email"])
 
         if (
             pharmacist is not None
-            and check_password(data["password"], pharmacist.password)
+            and verify_password(data["password"], pharmacist.password)
             and pharmacist.active
         ):
             serializer = PharmacistProfileSerializer(pharmacist)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(
+                {**serializer.data, **issue_tokens(pharmacist)},
+                status=status.HTTP_200_OK,
+            )
         else:
             return Response(
                 "message: Invalid credentials", status=status.HTTP_400_BAD_REQUEST
@@ -154,23 +322,145 @@ class SpecializationViewSet(viewsets.ModelViewSet):
     serializer_class = SpecializationSerializer
     queryset = Specialization.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, "list", lambda: super(SpecializationViewSet, self).list(request)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            f"detail:{kwargs['pk']}",
+            lambda: super(SpecializationViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
 
-class UpdatePatientProfileViewSet(viewsets.ModelViewSet):
+    def cached_response(self, request, name, build):
+        """
+        this function will serve the response from the cache of the current
+        specializations version with a strong ETag, and 304 when the client has it
+
+        """
+
+        key = specialization_cache_key(specialization_version(), name)
+        entry = cache.get(key)
+
+        if entry is None:
+            response = build()
+            body = json.dumps(response.data, sort_keys=True).encode()
+            entry = (quote_etag(hashlib.sha256(body).hexdigest()), response.data)
+            cache.set(key, entry, timeout=None)
+
+        etag, data = entry
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag})
+
+
+class SparseFieldsMixin:
+    """
+    this class will narrow the SQL of the profile viewsets to the columns
+    of the fields asked for by ?fields= or ?exclude=
+
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if requested_fields(self.request, ()) is None:
+            return queryset
+
+        model = queryset.model
+        columns = {"id", "created_at"}
+        for field in self.get_serializer().fields.values():
+            try:
+                columns.add(model._meta.get_field(field.source).name)
+            except FieldDoesNotExist:
+                pass
+        return queryset.only(*columns)
+
+
+class FastListMixin:
+    """
+    this class will render the profile lists from values_list() rows through
+    ValuesReader when ACCOUNTS_FAST_LIST is set, instead of a serializer per row
+
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = None
+        if getattr(settings, "ACCOUNTS_FAST_LIST", False):
+            reader = ValuesReader.for_serializer(self.get_serializer())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = reader.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.render(page))
+        return Response(reader.render(rows))
+
+
+class UpdatePatientProfileViewSet(
+    FastListMixin, SparseFieldsMixin, viewsets.ModelViewSet
+):
     """this class is used to update a patient profile and check if the patient profile already exists"""
 
     serializer_class = ProfilePatientSerializer
     queryset = Patient.objects.all()
+    permission_classes = [IsAccountOwnerOrReadOnly]
+    pagination_class = ProfileCursorPagination
+    account_role = "patient"
+    read_from_replica = True
 
 
-class UpdateDoctorProfileViewSet(viewsets.ModelViewSet):
+class UpdateDoctorProfileViewSet(
+    FastListMixin, SparseFieldsMixin, viewsets.ModelViewSet
+):
     """this class is used to update a doctor profile and check if the doctor profile already exists"""
 
     serializer_class = DoctorProfileSerializer
     queryset = Doctor.objects.all()
+    permission_classes = [IsAccountOwnerOrReadOnly]
+    pagination_class = ProfileCursorPagination
+    account_role = "doctor"
+    read_from_replica = True
 
 
-class UpdatePharmacistProfileViewSet(viewsets.ModelViewSet):
+class UpdatePharmacistProfileViewSet(
+    FastListMixin, SparseFieldsMixin, viewsets.ModelViewSet
+):
     """this class is used to update a pharmacist profile and check if the pharmacist profile already exists"""
 
     serializer_class = PharmacistProfileSerializer
     queryset = Pharmacist.objects.all()
+    permission_classes = [IsAccountOwnerOrReadOnly]
+    pagination_class = ProfileCursorPagination
+    account_role = "pharmacist"
+    read_from_replica = True
+
+
+class PendingStaffView(generics.ListAPIView):
+    """
+    this class is used to list the doctors or pharmacists waiting for approval,
+    oldest first, with the ids to approve them by
+    """
+
+    permission_classes = [IsAdminUser]
+    pagination_class = PendingCursorPagination
+    serializer_classes = {
+        "doctors": PendingDoctorSerializer,
+        "pharmacists": PendingPharmacistSerializer,
+    }
+
+    def get_serializer_class(self):
+        serializer_class = self.serializer_classes.get(self.kwargs["kind"])
+        if serializer_class is None:
+            raise NotFound("message: Unknown staff")
+        return serializer_class
+
+    def get_queryset(self):
+        serializer_class = self.get_serializer_class()
+        model = serializer_class.Meta.model
+        # active=False matches the condition of the partial pending index
+        return model.objects.filter(active=False).only(*serializer_class.Meta.fields)
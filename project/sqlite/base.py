@@ -0,0 +1,111 @@
+"""
+in this module we will run SQLite in WAL mode for the small deployments,
+the pragmas of PRAGMAS are run on every new connection through the init_command
+of the sqlite backend, the transactions start with BEGIN IMMEDIATE through its
+transaction_mode so the writers wait for the lock in the busy timeout instead of
+failing when they upgrade a read lock, and the statements that still find the
+database locked outside of a transaction are retried with a backoff
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "project.sqlite",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {"pragmas": {"cache_size": -64000}, "lock_retries": 5},
+        }
+    }
+
+"""
+
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    # negative sizes are in KiB, 20 MiB of page cache per connection
+    "cache_size": -20000,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+LOCK_RETRIES = 5
+RETRY_DELAY = 0.01
+MAX_RETRY_DELAY = 0.5
+
+
+def is_locked_error(error):
+    """this function will tell if an OperationalError comes from a locked database"""
+
+    return "locked" in str(error)
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    """
+    this class will retry the statements that fail with a locked database,
+    only in autocommit, a statement inside a transaction is never retried alone
+
+    """
+
+    def __init__(self, connection, retries):
+        super().__init__(connection)
+        self.retries = retries
+
+    def retry(self, run):
+        attempt = 0
+        while True:
+            try:
+                return run()
+            except base.Database.OperationalError as error:
+                if (
+                    not is_locked_error(error)
+                    or self.connection.in_transaction
+                    or attempt >= self.retries
+                ):
+                    raise
+            delay = min(RETRY_DELAY * 2**attempt, MAX_RETRY_DELAY)
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            attempt += 1
+
+    def execute(self, query, params=None):
+        return self.retry(
+            lambda: super(RetryingCursorWrapper, self).execute(query, params)
+        )
+
+    def executemany(self, query, param_list):
+        param_list = list(param_list)
+        return self.retry(
+            lambda: super(RetryingCursorWrapper, self).executemany(query, param_list)
+        )
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    this class will be the sqlite backend with the pragmas and the retries,
+    an init_command or a transaction_mode of the OPTIONS is kept
+
+    """
+
+    def get_connection_params(self):
+        options = self.settings_dict["OPTIONS"]
+        kwargs = super().get_connection_params()
+        # the sqlite3 module does not know the options of this backend
+        pragmas = {**PRAGMAS, **kwargs.pop("pragmas", {})}
+        self.lock_retries = kwargs.pop("lock_retries", LOCK_RETRIES)
+
+        self.init_commands = [
+            f"PRAGMA {name} = {value}" for name, value in pragmas.items()
+        ] + self.init_commands
+        if "transaction_mode" not in options:
+            self.transaction_mode = "IMMEDIATE"
+        return kwargs
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(
+            factory=lambda connection: RetryingCursorWrapper(
+                connection, self.lock_retries
+            )
+        )